@@ -0,0 +1,200 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple
+
+import numpy as np
+
+from classifier import Classifier
+from profiler import profiler
+from season import Season
+from span import Span
+
+# Probabilities are clipped away from 0 and 1 before taking logs, as the Kaggle scorer does.
+EPSILON = 1e-15
+
+
+def _score(win_p: np.ndarray, labels: np.ndarray, years: np.ndarray) -> np.ndarray:
+    # Span.score on arrays: the average over seasons of each season's log loss. The last axis of win_p is the
+    # match-up axis, so that blocks of predictions (e.g. one per permutation) are scored at once.
+    win_p = np.clip(win_p, EPSILON, 1 - EPSILON)
+    losses = -1 * (labels * np.log(win_p) + (1 - labels) * np.log(1 - win_p))
+    return np.mean([losses[..., years == year].mean(axis=-1) for year in np.unique(years)], axis=0)
+
+
+def _evaluate(classifier_type: str, train_features: np.ndarray, train_labels: np.ndarray,
+              test_features: np.ndarray, test_labels: np.ndarray, test_years: np.ndarray, max_iter: int) -> float:
+    # Runs in a worker process: only the sliced matrices travel to it.
+    classifier = Span.fit_classifier(classifier_type, train_features, train_labels, max_iter)
+    win_p = np.asarray(classifier.predict_proba_features(test_features))[:, 1]
+    return float(_score(win_p, test_labels, test_years))
+
+
+class FeatureAblation:
+    """
+    Evaluates subsets of candidate features on a backtest (train span, test span), without editing the feature
+    lists by hand and retraining serially:
+    - leave_one_out: the score without each feature in turn;
+    - forward_selection: greedily adds the feature improving the score the most, until none does;
+    - permutation_importance: how much the score degrades when a feature's values are shuffled.
+
+    The spans' features are set to all the candidates, built once into a full train matrix and a full test matrix
+    (the tournament match-ups which took place). A subset of features is a subset of columns of those matrices:
+    nothing is rebuilt. Subsets are fitted and scored in parallel worker processes.
+
+    Scores are log losses averaged over the test seasons, like Span.score: lower is better. The spans' feature
+    selections are restored once the matrices are built.
+
+    E.g. ablation = FeatureAblation(train_span, test_span, ["seeds_positions", "rankings", "win_ratio"],
+                                    ["seeds_diff", "ranking_diff"], classifier_type="LR")
+         ablation.leave_one_out()
+    """
+
+    # Default candidates. Ranking features need the MOR rankings of every season from 2003 on: men's data only.
+    ABSOLUTE_FEATURES: [str] = ["seeds_positions", "rankings", "win_ratio", "gap_average", "adjusted_win_pct"]
+    RELATIVE_FEATURES: [str] = ["seeds_diff", "ranking_diff"]
+    RANKING_FEATURES: [str] = ["rankings", "ranking_diff"]
+
+    def __init__(self, train_span: Span, test_span: Span, absolute_features: [str], relative_features: [str],
+                 classifier_type: str = "LR", max_iter: int = 1000, max_workers: int = None):
+        self.absolute_features: [str] = list(absolute_features)
+        self.relative_features: [str] = list(relative_features)
+        self.classifier_type: str = classifier_type
+        self.max_iter: int = max_iter
+        self.max_workers: int = max_workers
+        self.logger = self._get_logger()
+
+        # Columns of each feature in the full matrices: absolute features take two columns, relative ones one.
+        layout = Season.get_feature_layout(self.absolute_features, self.relative_features)
+        self.columns: Dict[str, [int]] = {name: [layout.index(f"{name}_1"), layout.index(f"{name}_2")]
+                                          for name in self.absolute_features}
+        self.columns.update({name: [layout.index(name)] for name in self.relative_features})
+
+        seasons = train_span.seasons + test_span.seasons
+        ranking_features = [name for name in self.features if name in FeatureAblation.RANKING_FEATURES]
+        unranked_years = [season.year for season in seasons
+                          if season.year >= 2003 and "MOR" not in season.tournament.rankings]
+        assert not ranking_features or not unranked_years, \
+            f"Can't evaluate {ranking_features}: no MOR rankings for {unranked_years}."
+
+        with profiler.stage("ablation.features"):
+            selections = [(season, season.absolute_features, season.relative_features) for season in seasons]
+            try:
+                train_span.set_features(self.absolute_features, self.relative_features)
+                test_span.set_features(self.absolute_features, self.relative_features)
+
+                train_features, train_labels = train_span.get_features_and_labels()
+                self.train_features: np.ndarray = np.asarray(train_features, dtype=np.float64)
+                self.train_labels: np.ndarray = np.asarray(train_labels, dtype=np.int64)
+
+                test_features, test_labels, test_years = [], [], []
+                for season in test_span.seasons:
+                    _, _, features, labels = season.get_prediction_data()
+                    played = labels != -1
+                    test_features.append(features[played])
+                    test_labels.append(labels[played])
+                    test_years.append(np.full(played.sum(), season.year))
+                self.test_features: np.ndarray = np.concatenate(test_features)
+                self.test_labels: np.ndarray = np.concatenate(test_labels)
+                self.test_years: np.ndarray = np.concatenate(test_years)
+            finally:
+                # In reverse, so that a season in both spans gets its original selection back.
+                for season, absolute_features, relative_features in reversed(selections):
+                    season.set_features(absolute_features, relative_features)
+
+    @staticmethod
+    def _get_logger():
+        return logging.getLogger(__name__)
+
+    @property
+    def features(self) -> [str]:
+        return self.absolute_features + self.relative_features
+
+    def _get_columns(self, features: [str]) -> [int]:
+        return [column for name in features for column in self.columns[name]]
+
+    """
+    Fits and scores each subset of features, in parallel. Returns the scores in the same order.
+    """
+
+    def evaluate(self, subsets: [[str]]) -> [float]:
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = []
+            for subset in subsets:
+                columns = self._get_columns(subset)
+                futures.append(executor.submit(_evaluate, self.classifier_type, self.train_features[:, columns],
+                                               self.train_labels, self.test_features[:, columns], self.test_labels,
+                                               self.test_years, self.max_iter))
+            return [future.result() for future in futures]
+
+    """
+    Returns the score with all features ("all") and without each feature in turn.
+    """
+
+    @profiler.profiled("ablation.leave_one_out")
+    def leave_one_out(self) -> Dict[str, float]:
+        subsets = [self.features] + [[name for name in self.features if name != removed] for removed in self.features]
+        scores = self.evaluate(subsets)
+        return dict(zip(["all"] + self.features, scores))
+
+    """
+    Greedy forward selection, starting from the given features (none by default, or e.g. ["seeds_diff"]). Each step
+    evaluates every remaining feature in parallel and keeps the best one, as long as it improves the score.
+
+    Returns the selection steps: the features selected so far and their score, after each step.
+    """
+
+    @profiler.profiled("ablation.forward_selection")
+    def forward_selection(self, initial_features: [str] = (), max_features: int = None) -> [Tuple[[str], float]]:
+        selected = list(initial_features)
+        steps = []
+        best_score = self.evaluate([selected])[0] if selected else np.inf
+        max_features = len(self.features) if max_features is None else max_features
+
+        while len(selected) < max_features:
+            candidates = [name for name in self.features if name not in selected]
+            if not candidates:
+                break
+            scores = self.evaluate([selected + [name] for name in candidates])
+            best = int(np.argmin(scores))
+            if scores[best] >= best_score:
+                break
+
+            selected.append(candidates[best])
+            best_score = scores[best]
+            steps.append((list(selected), best_score))
+            self.logger.info(f'Selected {candidates[best]}: {best_score:.5f}.')
+        return steps
+
+    """
+    Returns, for each feature, the mean and standard deviation over repeats of the score increase when the
+    feature's values are shuffled across test match-ups (both columns together for absolute features).
+
+    The classifier is fitted on all features unless one is given. All the permuted test matrices (features x
+    repeats) are stacked and predicted in a single batched call, then scored block by block.
+    """
+
+    @profiler.profiled("ablation.permutation_importance")
+    def permutation_importance(self, classifier: Classifier = None, repeats: int = 5,
+                               seed: int = 0) -> Dict[str, Tuple[float, float]]:
+        if classifier is None:
+            classifier = Span.fit_classifier(self.classifier_type, self.train_features, self.train_labels,
+                                             self.max_iter)
+        baseline = _score(np.asarray(classifier.predict_proba_features(self.test_features))[:, 1], self.test_labels,
+                          self.test_years)
+
+        generator = np.random.default_rng(seed)
+        number_rows = len(self.test_labels)
+        blocks = np.repeat(self.test_features[np.newaxis], len(self.features) * repeats, axis=0)
+        for idx, name in enumerate(self.features):
+            for repeat in range(repeats):
+                permutation = generator.permutation(number_rows)
+                block = blocks[idx * repeats + repeat]
+                block[:, self.columns[name]] = self.test_features[permutation][:, self.columns[name]]
+
+        win_p = np.asarray(classifier.predict_proba_features(blocks.reshape(-1, self.test_features.shape[1])))[:, 1]
+        scores = _score(win_p.reshape(len(self.features), repeats, number_rows), self.test_labels, self.test_years)
+        increases = scores - baseline
+        profiler.count(len(win_p))
+
+        return {name: (float(increases[idx].mean()), float(increases[idx].std()))
+                for idx, name in enumerate(self.features)}
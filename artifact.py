@@ -0,0 +1,77 @@
+import pickle
+from datetime import datetime, timezone
+from typing import Dict
+
+from classifier import Classifier
+from span import Span
+
+# Bumped whenever the artifact layout changes, so older artifacts are refused instead of misread.
+FORMAT_VERSION = 1
+
+
+class ModelArtifact:
+    """
+    A fitted classifier wrapper (estimator and MinMaxScaler together) persisted to disk with the metadata needed to
+    trust it later:
+    - the classifier type and the training span's years;
+    - the feature layout, i.e. the name of each feature vector column;
+    - a hash of the training data (see Span.get_data_hash);
+    - the sklearn version the estimator was fitted with.
+
+    Predicting from an artifact is a load plus an inference pass, instead of a retrain.
+
+    E.g. ModelArtifact.from_span(train_span, train_span.train(50000)).save("mlp.pkl")
+         classifier = ModelArtifact.load("mlp.pkl", test_span.feature_layout).classifier
+    """
+
+    def __init__(self, classifier: Classifier, metadata: Dict):
+        self.classifier: Classifier = classifier
+        self.metadata: Dict = metadata
+
+    @staticmethod
+    def from_span(span: Span, classifier: Classifier, max_iter: int = None) -> "ModelArtifact":
+        import sklearn
+
+        metadata = {
+            "format_version": FORMAT_VERSION,
+            "classifier_type": span.classifier_type,
+            "classifier_class": type(classifier).__name__,
+            "train_years": span.years,
+            "feature_layout": span.feature_layout,
+            "data_hash": span.get_data_hash(),
+            "max_iter": max_iter,
+            "sklearn_version": sklearn.__version__,
+            "created_at": datetime.now(timezone.utc).isoformat(),
+        }
+        return ModelArtifact(classifier, metadata)
+
+    @property
+    def feature_layout(self) -> [str]:
+        return self.metadata["feature_layout"]
+
+    def save(self, path: str):
+        with open(path, 'wb') as f:
+            pickle.dump({"metadata": self.metadata, "classifier": self.classifier}, f)
+
+    """
+    Loads an artifact. When an expected feature layout is given (usually the feature layout of the span to predict
+    on), refuses artifacts fitted on a different layout: their predictions would silently be garbage.
+
+    Only load artifacts you created, unpickling runs arbitrary code.
+    """
+
+    @staticmethod
+    def load(path: str, feature_layout: [str] = None) -> "ModelArtifact":
+        with open(path, 'rb') as f:
+            content = pickle.load(f)
+
+        metadata = content["metadata"]
+        assert metadata.get("format_version") == FORMAT_VERSION, \
+            f"Artifact {path} has format version {metadata.get('format_version')}, expected {FORMAT_VERSION}."
+
+        if feature_layout is not None:
+            assert list(feature_layout) == metadata["feature_layout"], \
+                f"Artifact {path} was fitted on features {metadata['feature_layout']}, " \
+                f"but the features to predict on are {list(feature_layout)}."
+
+        return ModelArtifact(content["classifier"], metadata)
@@ -0,0 +1,273 @@
+"""
+Benchmark suite for the data and model pipeline, run against generated fixtures (see fixtures.py) so results are
+reproducible without the Git LFS resources.
+
+Run from the repository root:
+    python -m benchmark run --output benchmarks/baseline.json
+    python -m benchmark compare benchmarks/baseline.json --threshold 0.2
+
+The compare mode runs the suite again (or loads --current) and flags every case whose median time or peak memory
+regressed by more than the threshold. It exits with a non-zero status when there is a regression.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+import warnings
+from typing import Callable, Dict
+
+from classifier import FiftyFiftyClassifier
+from fixtures import FixtureGenerator
+from parser import Parser
+from season import RegularSeason
+from span import Span
+from teams import TeamRegistry
+
+
+class BenchmarkCase:
+    """
+    A named function to measure. The setup function runs once, outside of any measurement, and its output is
+    passed to the measured function.
+    """
+
+    def __init__(self, name: str, function: Callable, setup: Callable = lambda: None):
+        self.name: str = name
+        self.function: Callable = function
+        self.setup: Callable = setup
+
+
+class Benchmark:
+    """
+    Runs the benchmark cases over fixtures of a given size. Each case runs repeat times to time it (we keep the
+    minimum and the median), plus once under tracemalloc to measure its peak memory: tracing allocations slows
+    code down, so it never overlaps with timing.
+    """
+
+    def __init__(self, path: str, gender: str = "M", repeat: int = 5, max_iter: int = 200):
+        self.path: str = os.path.join(path, '')
+        self.gender: str = gender
+        self.repeat: int = repeat
+        self.max_iter: int = max_iter
+
+    def _parser(self) -> Parser:
+        return Parser(self.gender, self.path)
+
+    def _seasons(self) -> Dict:
+        seasons, _ = self._parser().parse()
+        return seasons
+
+    def _spans(self):
+        seasons = self._seasons()
+        years = sorted(seasons.keys())
+        return Span.create_spans(seasons, years[0], years[-3], years[-2], years[-1], "LR")
+
+    def _parsed_inputs(self):
+        parser = self._parser()
+        rankings = parser.parse_rankings() if self.gender == "M" else {}
+        return (parser, parser.parse_regular_seasons_games(), parser.parse_tournaments_games(),
+                TeamRegistry(parser.parse_teams()), parser.parse_seeds(), rankings)
+
+    def _regular_seasons_inputs(self):
+        seasons = self._seasons()
+        return [(season.year, season.regular_season.day_zero, season.regular_season.regular_season_games,
+                 season.qualified_teams_ids, season.teams) for season in seasons.values()]
+
+    def _span_predictions(self):
+        train_span, test_span = self._spans()
+        classifier = train_span.train(self.max_iter)
+        return test_span.predict(test_span.build_seasons_classifiers_map(classifier))
+
+    def _warm_seasons(self) -> Dict:
+        seasons = self._seasons()
+        Benchmark._predict_seasons(seasons, cached=True)
+        return seasons
+
+    @staticmethod
+    def _predict_seasons(seasons: Dict, cached: bool):
+        # Seasons cache their prediction features on first prediction: unless measuring the cached path, drop them
+        # so that every repeat builds them.
+        for season in seasons.values():
+            if not cached:
+                season.clear_prediction_data()
+            season.predict(FiftyFiftyClassifier())
+
+    def _train_span(self, classifier_type: str) -> Span:
+        train_span, _ = self._spans()
+        train_span.classifier_type = classifier_type
+        return train_span
+
+    def cases(self) -> [BenchmarkCase]:
+        cases = [
+            BenchmarkCase("parse_teams", lambda _: self._parser().parse_teams()),
+            BenchmarkCase("parse_regular_seasons_games", lambda _: self._parser().parse_regular_seasons_games()),
+            BenchmarkCase("parse_tournaments_games", lambda _: self._parser().parse_tournaments_games()),
+            BenchmarkCase("parse_seeds", lambda _: self._parser().parse_seeds()),
+        ]
+        if self.gender == "M":
+            cases.append(BenchmarkCase("parse_rankings", lambda _: self._parser().parse_rankings()))
+
+        cases.extend([
+            BenchmarkCase("parse_seasons", lambda inputs: inputs[0].parse_seasons(*inputs[1:]), self._parsed_inputs),
+            BenchmarkCase("regular_season", lambda inputs: [RegularSeason(*season_inputs) for season_inputs in inputs],
+                          self._regular_seasons_inputs),
+            BenchmarkCase("season_features", lambda seasons: [season.get_season_features_and_labels()
+                                                              for season in seasons.values()], self._seasons),
+            BenchmarkCase("season_predict", lambda seasons: Benchmark._predict_seasons(seasons, cached=False),
+                          self._seasons),
+            BenchmarkCase("season_predict_cached", lambda seasons: Benchmark._predict_seasons(seasons, cached=True),
+                          self._warm_seasons),
+        ])
+        for classifier_type in ["MLP", "LR", "GB"]:
+            cases.append(BenchmarkCase(f"span_train_{classifier_type}", lambda span: span.train(self.max_iter),
+                                       lambda classifier_type=classifier_type: self._train_span(classifier_type)))
+        cases.append(BenchmarkCase("span_score", Span.score, self._span_predictions))
+        return cases
+
+    def run(self, names: [str] = None) -> Dict[str, Dict]:
+        results: Dict[str, Dict] = {}
+        for case in self.cases():
+            if names and case.name not in names:
+                continue
+            results[case.name] = self.measure(case)
+            print(f"{case.name:<30}{results[case.name]['median'] * 1000:>12.2f} ms"
+                  f"{results[case.name]['peak_memory'] / 2 ** 20:>12.2f} MiB", file=sys.stderr)
+        return results
+
+    def measure(self, case: BenchmarkCase) -> Dict:
+        inputs = case.setup()
+
+        timings = []
+        for _ in range(self.repeat):
+            start = time.perf_counter()
+            case.function(inputs)
+            timings.append(time.perf_counter() - start)
+
+        tracemalloc.start()
+        try:
+            start_memory, _ = tracemalloc.get_traced_memory()
+            case.function(inputs)
+            _, peak_memory = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+        return {"min": min(timings), "median": statistics.median(timings), "peak_memory": peak_memory - start_memory}
+
+
+"""
+Compares two benchmark results. Returns, for each case present in both, the relative change of the median time
+and of the peak memory (0.1 = 10 % worse), and whether either exceeds the threshold.
+"""
+
+
+def compare(baseline: Dict, current: Dict, threshold: float) -> Dict[str, Dict]:
+    comparison: Dict[str, Dict] = {}
+    for name, baseline_case in baseline["cases"].items():
+        if name not in current["cases"]:
+            continue
+        current_case = current["cases"][name]
+        time_change = current_case["median"] / baseline_case["median"] - 1
+        memory_change = current_case["peak_memory"] / max(baseline_case["peak_memory"], 1) - 1
+        comparison[name] = {
+            "time_change": time_change,
+            "memory_change": memory_change,
+            "regression": time_change > threshold or memory_change > threshold,
+        }
+    return comparison
+
+
+def run_suite(args) -> Dict:
+    # Benchmarks train with few iterations on purpose: convergence warnings are expected.
+    warnings.filterwarnings("ignore", message="Stochastic Optimizer")
+
+    with tempfile.TemporaryDirectory() as path:
+        generator = FixtureGenerator(args.teams, args.first_season, args.seasons, args.games_per_team, args.seed)
+        generator.write(path, args.gender)
+        cases = Benchmark(path, args.gender, args.repeat, args.max_iter).run(args.cases)
+
+    import numpy
+    import sklearn
+    return {
+        "meta": {
+            "python": platform.python_version(),
+            "numpy": numpy.__version__,
+            "sklearn": sklearn.__version__,
+            "machine": platform.machine(),
+            "fixtures": {"gender": args.gender, "teams": args.teams, "first_season": args.first_season,
+                         "seasons": args.seasons, "games_per_team": args.games_per_team, "seed": args.seed},
+            "repeat": args.repeat,
+            "max_iter": args.max_iter,
+        },
+        "cases": cases,
+    }
+
+
+def run_command(args):
+    results = run_suite(args)
+    if args.output:
+        os.makedirs(os.path.dirname(args.output) or ".", exist_ok=True)
+        with open(args.output, 'w') as f:
+            json.dump(results, f, indent=2)
+    else:
+        print(json.dumps(results, indent=2))
+
+
+def compare_command(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+
+    if args.current:
+        with open(args.current) as f:
+            current = json.load(f)
+    else:
+        # Measure on the same fixtures as the baseline.
+        for key, value in baseline["meta"]["fixtures"].items():
+            setattr(args, key, value)
+        current = run_suite(args)
+
+    regressions = 0
+    for name, case in compare(baseline, current, args.threshold).items():
+        flag = "REGRESSION" if case["regression"] else "ok"
+        regressions += case["regression"]
+        print(f"{name:<30}{case['time_change']:>+10.1%} time{case['memory_change']:>+10.1%} memory  {flag}")
+
+    if regressions:
+        print(f"{regressions} regression(s) beyond {args.threshold:.0%}.")
+        sys.exit(1)
+
+
+def main(argv: [str] = None):
+    arguments_parser = argparse.ArgumentParser(prog="benchmark", description="Pipeline benchmarks.")
+    commands = arguments_parser.add_subparsers(dest="command", required=True)
+
+    suite = argparse.ArgumentParser(add_help=False)
+    suite.add_argument("--gender", default="M", choices=["M", "W"])
+    suite.add_argument("--teams", type=int, default=120)
+    suite.add_argument("--first-season", type=int, default=2003)
+    suite.add_argument("--seasons", type=int, default=6)
+    suite.add_argument("--games-per-team", type=int, default=25)
+    suite.add_argument("--seed", type=int, default=0)
+    suite.add_argument("--repeat", type=int, default=5)
+    suite.add_argument("--max-iter", type=int, default=200)
+    suite.add_argument("--cases", nargs="+", help="Only run these cases.")
+
+    command = commands.add_parser("run", parents=[suite], help="Run the suite and store the results.")
+    command.add_argument("--output", help="JSON file to write, printed to stdout otherwise.")
+    command.set_defaults(function=run_command)
+
+    command = commands.add_parser("compare", parents=[suite], help="Flag regressions against a baseline.")
+    command.add_argument("baseline")
+    command.add_argument("--current", help="Results to compare, otherwise the suite runs again.")
+    command.add_argument("--threshold", type=float, default=0.2, help="Relative change flagged as a regression.")
+    command.set_defaults(function=compare_command)
+
+    args = arguments_parser.parse_args(argv)
+    args.function(args)
+
+
+if __name__ == "__main__":
+    main()
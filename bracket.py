@@ -0,0 +1,139 @@
+import csv
+from typing import Dict, Union
+
+import numpy as np
+
+from game import Game
+
+# Seed positions paired in the first round of each region, in bracket order: the winners of consecutive pairs
+# meet in the next round.
+BRACKET_ORDER = [1, 16, 8, 9, 5, 12, 4, 13, 6, 11, 3, 14, 7, 10, 2, 15]
+
+# Regions W and X meet in one national semi-final, Y and Z in the other.
+REGIONS = ["W", "X", "Y", "Z"]
+
+
+class LiveBracket:
+    """
+    Advancement probabilities of every team of a tournament, conditioned on the results known so far.
+
+    The bracket is a complete binary tree stored as a heap: node 1 is the final, nodes k * 2 and k * 2 + 1 are the
+    two sub-brackets of node k, and the 64 leaves are the seed lines of each region in bracket order. A leaf holds
+    one team, or the two teams of a First Four game. Each node caches the distribution of its sub-bracket's winner,
+    a vector over the tournament teams:
+        winner[k] = winner[2k] * (W @ winner[2k + 1]) + winner[2k + 1] * (W @ winner[2k])
+    where W[i, j] is the probability that team i beats team j.
+
+    A result fixes the winner of the node where both teams met. Only that node and its ancestors (at most 7 nodes)
+    are recomputed, every other sub-bracket keeps its cached distribution: an update costs a few vector products.
+
+    E.g. bracket = season.get_live_bracket(classifier)
+         bracket.add_result("2022,136,1242,72,1168,69,N,0")  # NCAATourneyCompactResults row.
+         bracket.get_advancement_probabilities()
+    """
+
+    def __init__(self, team_ids: [int], leaves: [[int]], win_p: np.ndarray):
+        self.team_ids: np.ndarray = np.array(team_ids, dtype=np.int64)
+        self.indices: Dict[int, int] = {team_id: idx for idx, team_id in enumerate(team_ids)}
+        self.win_p: np.ndarray = win_p
+        self.number_leaves: int = len(leaves)
+        self.depth: int = int(np.log2(self.number_leaves))
+        assert 2 ** self.depth == self.number_leaves, f"A bracket needs a power of 2 of slots, not {len(leaves)}."
+
+        # Leaf (heap node) of each team, and the teams of each leaf.
+        self.leaves: Dict[int, [int]] = {}
+        self.team_leaves: Dict[int, int] = {}
+        for idx, leaf_team_ids in enumerate(leaves):
+            node = self.number_leaves + idx
+            self.leaves[node] = [self.indices[team_id] for team_id in leaf_team_ids]
+            for team_id in leaf_team_ids:
+                self.team_leaves[team_id] = node
+
+        # Results: node -> index of the team which won there.
+        self.winners: Dict[int, int] = {}
+        self.results: [Game] = []
+
+        self.distributions: np.ndarray = np.zeros((2 * self.number_leaves, len(team_ids)))
+        for node in range(2 * self.number_leaves - 1, 0, -1):
+            self._compute(node)
+
+    def _compute(self, node: int):
+        distribution = np.zeros(len(self.team_ids))
+        if node in self.winners:
+            distribution[self.winners[node]] = 1
+        elif node >= self.number_leaves:
+            teams = self.leaves[node]
+            if len(teams) == 1:
+                distribution[teams[0]] = 1
+            else:
+                # First Four game.
+                distribution[teams[0]] = self.win_p[teams[0], teams[1]]
+                distribution[teams[1]] = self.win_p[teams[1], teams[0]]
+        else:
+            left, right = self.distributions[2 * node], self.distributions[2 * node + 1]
+            distribution = left * (self.win_p @ right) + right * (self.win_p @ left)
+        self.distributions[node] = distribution
+
+    """
+    Returns the node where two teams meet: their lowest common ancestor, or their leaf for a First Four game.
+    """
+
+    def get_node(self, team_1_id: int, team_2_id: int) -> int:
+        node_1, node_2 = self.team_leaves[team_1_id], self.team_leaves[team_2_id]
+        while node_1 != node_2:
+            node_1, node_2 = node_1 // 2, node_2 // 2
+        return node_1
+
+    """
+    Conditions the bracket on a completed game: a Game, or a row of NCAATourneyCompactResults (a CSV line or its
+    list of values). Recomputes the game's node and its ancestors only.
+    """
+
+    def add_result(self, result: Union[Game, str, list]):
+        game = result if isinstance(result, Game) else LiveBracket.parse_result(result)
+        node = self.get_node(game.w_team_id, game.l_team_id)
+        w_idx, l_idx = self.indices[game.w_team_id], self.indices[game.l_team_id]
+
+        # Both teams must still be alive in their half of the node's sub-bracket.
+        if node < self.number_leaves:
+            halves = self.distributions[2 * node] + self.distributions[2 * node + 1]
+            assert halves[w_idx] > 0 and halves[l_idx] > 0, \
+                f"{game.w_team_id} and {game.l_team_id} can't meet anymore in {game.year}."
+        assert node not in self.winners, f"The game of {game.w_team_id} vs. {game.l_team_id} already has a result."
+
+        self.winners[node] = w_idx
+        self.results.append(game)
+        while node >= 1:
+            self._compute(node)
+            node //= 2
+
+    @staticmethod
+    def parse_result(row: Union[str, list]) -> Game:
+        if isinstance(row, str):
+            row = next(csv.reader([row]))
+        return Game(int(row[0]), int(row[1]), int(row[2]), int(row[3]), int(row[4]), int(row[5]), row[6],
+                    int(row[7]))
+
+    """
+    Returns a rounds x teams matrix (columns in team IDs order): row r holds each team's probability to win its game
+    of round r, i.e. to win its sub-bracket at depth depth - r. Row 0 covers the First Four (1 for the teams which
+    don't play it) and the last row is the probability to win the tournament.
+    """
+
+    def get_advancement_probabilities(self) -> np.ndarray:
+        # Every team appears in exactly one node per level: summing a level's nodes gives its round probabilities.
+        return np.array([self.distributions[2 ** level:2 ** (level + 1)].sum(axis=0)
+                         for level in range(self.depth, -1, -1)])
+
+    """
+    Returns a team's probability to win each round, like get_advancement_probabilities.
+    """
+
+    def get_team_probabilities(self, team_id: int) -> [float]:
+        node = self.team_leaves[team_id]
+        idx = self.indices[team_id]
+        probabilities = []
+        while node >= 1:
+            probabilities.append(float(self.distributions[node, idx]))
+            node //= 2
+        return probabilities
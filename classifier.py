@@ -1,14 +1,18 @@
 from abc import ABC, abstractmethod
-from typing import Dict
+from typing import Dict, TYPE_CHECKING
 
-from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.neural_network import MLPClassifier
-from sklearn.preprocessing import MinMaxScaler
+import numpy as np
 
 from sample import Sample
 from seed import Seed
 
+# sklearn is only imported for type checking: the wrapped estimators are imported lazily, where they are fitted.
+if TYPE_CHECKING:
+    from sklearn.ensemble import GradientBoostingClassifier
+    from sklearn.linear_model import LogisticRegression
+    from sklearn.neural_network import MLPClassifier
+    from sklearn.preprocessing import MinMaxScaler
+
 
 class Classifier(ABC):
 
@@ -30,67 +34,210 @@ class FiftyFiftyClassifier(Classifier):
         return [[0.5, 0.5]] * len(samples)
 
 
-class NeuralNetworkClassifier(Classifier):
+class ScaledEstimatorClassifier(Classifier, ABC):
     """
-    Wrapper classifier around an MLPClassifier.
+    Base wrapper around a fitted sklearn estimator and the MinMaxScaler its training features were scaled with.
     """
-    def __init__(self, mlp_classifier: MLPClassifier, scaler: MinMaxScaler):
-        self.mlp_classifier: MLPClassifier = mlp_classifier
-        self.scaler: MinMaxScaler = scaler
+    def __init__(self, scaler: "MinMaxScaler"):
+        self.scaler: "MinMaxScaler" = scaler
+
+    @property
+    @abstractmethod
+    def estimator(self):
+        pass
 
     def predict_proba(self, samples: [Sample]):
-        features = [sample.features for sample in samples]
+        return self.predict_proba_features([sample.features for sample in samples])
+
+    """
+    Same as predict_proba, but directly from a matrix of (unscaled) features, one row per sample.
+    """
+
+    def predict_proba_features(self, features):
         scaled = self.scaler.transform(features)
-        return self.mlp_classifier.predict_proba(scaled)
+        return self.estimator.predict_proba(scaled)
+
+
+class NeuralNetworkClassifier(ScaledEstimatorClassifier):
+    """
+    Wrapper classifier around an MLPClassifier.
+    """
+    def __init__(self, mlp_classifier: "MLPClassifier", scaler: "MinMaxScaler"):
+        super().__init__(scaler)
+        self.mlp_classifier: "MLPClassifier" = mlp_classifier
 
+    @property
+    def estimator(self) -> "MLPClassifier":
+        return self.mlp_classifier
 
-class LogisticRegressionClassifier(Classifier):
+
+class LogisticRegressionClassifier(ScaledEstimatorClassifier):
     """
     Wrapper classifier around an LogisticRegression.
     """
-    def __init__(self, lr_classifier: LogisticRegression, scaler: MinMaxScaler):
-        self.lr_classifier: LogisticRegression = lr_classifier
-        self.scaler: MinMaxScaler = scaler
+    def __init__(self, lr_classifier: "LogisticRegression", scaler: "MinMaxScaler"):
+        super().__init__(scaler)
+        self.lr_classifier: "LogisticRegression" = lr_classifier
 
-    def predict_proba(self, samples: [Sample]):
-        features = [sample.features for sample in samples]
-        scaled = self.scaler.transform(features)
-        return self.lr_classifier.predict_proba(scaled)
+    @property
+    def estimator(self) -> "LogisticRegression":
+        return self.lr_classifier
 
 
-class TreeClassifier(Classifier):
+class TreeClassifier(ScaledEstimatorClassifier):
     """
     Wrapper classifier around an GradientBoostingClassifier.
     """
-    def __init__(self, gb_classifier: GradientBoostingClassifier, scaler: MinMaxScaler):
-        self.gb_classifier: GradientBoostingClassifier = gb_classifier
-        self.scaler: MinMaxScaler = scaler
+    def __init__(self, gb_classifier: "GradientBoostingClassifier", scaler: "MinMaxScaler"):
+        super().__init__(scaler)
+        self.gb_classifier: "GradientBoostingClassifier" = gb_classifier
+
+    @property
+    def estimator(self) -> "GradientBoostingClassifier":
+        return self.gb_classifier
+
+
+class TeamValuesClassifier(Classifier, ABC):
+    """
+    Parameter-light heuristic classifier, computing win probabilities from a single value per team (seed position,
+    rating) for a single season.
+
+    Values are stored in arrays sorted by team ID, so probabilities of whole arrays of match-ups are computed at
+    once: team IDs are binary searched into indices, then the value differences go through the probability
+    function. The single parameter (spread, scale) is fitted by minimizing the log loss over a grid, evaluated for
+    all grid values at once by broadcasting.
+    """
+
+    # Candidate parameters evaluated by fit_parameter, and the default parameter.
+    PARAMETER_GRID: np.ndarray = np.linspace(0.01, 1, 100)
+    DEFAULT_PARAMETER: float = 0.5
+
+    def __init__(self, team_ids, values, parameter: float = None):
+        order = np.argsort(team_ids)
+        self.team_ids: np.ndarray = np.asarray(team_ids, dtype=np.int64)[order]
+        self.values: np.ndarray = np.asarray(values, dtype=np.float64)[order]
+        self.parameter: float = self.DEFAULT_PARAMETER if parameter is None else parameter
+
+    """
+    Vectorized probabilities that team_1 wins, given the differences of values (team_1 - team_2). Broadcasts, so a
+    column of parameters and a row of differences give a parameters x differences matrix.
+    """
+
+    @staticmethod
+    @abstractmethod
+    def probability(differences: np.ndarray, parameter):
+        pass
+
+    """
+    Positions of team IDs in the sorted team_ids, like TeamRegistry.indices. Raises a KeyError on IDs without a
+    value, instead of silently using a neighbour's value.
+    """
+
+    def _indices(self, team_ids) -> np.ndarray:
+        team_ids = np.asarray(team_ids, dtype=np.int64)
+        positions = np.searchsorted(self.team_ids, team_ids)
+        positions = np.minimum(positions, len(self.team_ids) - 1)
+        unknown = self.team_ids[positions] != team_ids
+        if unknown.any():
+            raise KeyError(f"Unknown team IDs: {np.unique(team_ids[unknown]).tolist()}")
+        return positions
+
+    def get_differences(self, team_1_ids, team_2_ids) -> np.ndarray:
+        return self.values[self._indices(team_1_ids)] - self.values[self._indices(team_2_ids)]
+
+    def predict_win_p(self, team_1_ids, team_2_ids) -> np.ndarray:
+        return self.probability(self.get_differences(team_1_ids, team_2_ids), self.parameter)
 
     def predict_proba(self, samples: [Sample]):
-        features = [sample.features for sample in samples]
-        scaled = self.scaler.transform(features)
-        return self.gb_classifier.predict_proba(scaled)
+        win_p = self.predict_win_p([sample.team_1_id for sample in samples], [sample.team_2_id for sample in samples])
+        return np.column_stack([1 - win_p, win_p])
+
+    """
+    Returns the parameter minimizing the log loss of the given value differences and labels (1 if team_1 won).
+    The grid is refined once around its best value.
+    """
+
+    @classmethod
+    def fit_parameter(cls, differences, labels, grid: np.ndarray = None) -> float:
+        differences = np.asarray(differences, dtype=np.float64)[np.newaxis, :]
+        labels = np.asarray(labels, dtype=np.float64)[np.newaxis, :]
+        grid = cls.PARAMETER_GRID if grid is None else np.asarray(grid, dtype=np.float64)
+
+        log_losses = cls._log_losses(differences, labels, grid)
+        best = int(np.argmin(log_losses))
 
+        # Refine between the best value's neighbours, without leaving the grid's range (e.g. a 0.5 spread gives 0/1
+        # probabilities).
+        if len(grid) > 1:
+            step = grid[1] - grid[0]
+            grid = np.linspace(max(grid[best] - step, grid[0]), min(grid[best] + step, grid[-1]), 41)
+            log_losses = cls._log_losses(differences, labels, grid)
+            best = int(np.argmin(log_losses))
 
-class SeedsBasedClassifier(Classifier):
+        return float(grid[best])
+
+    @classmethod
+    def _log_losses(cls, differences: np.ndarray, labels: np.ndarray, grid: np.ndarray) -> np.ndarray:
+        # One row of probabilities per candidate parameter.
+        win_p = np.clip(cls.probability(differences, grid[:, np.newaxis]), 1e-15, 1 - 1e-15)
+        return -1 * np.mean(labels * np.log(win_p) + (1 - labels) * np.log(1 - win_p), axis=1)
+
+
+class SeedsBasedClassifier(TeamValuesClassifier):
     """
-    Classifier using heuristics on seeds data to predict.
+    Classifier using heuristics on seeds data to predict: the win probability is linear in the seeds difference,
+    0.5 + spread * (team_2 seed - team_1 seed) / 15.
 
     Takes a dictionary as input, where a key is a team ID and the value the seed for that team.
     All values (Seed instances) in that dictionary should have the same year, otherwise the classifier has
     little meaning.
     """
+
+    # A spread of 0.5 gives 0 and 1 probabilities to 1 vs. 16 seeds match-ups.
+    PARAMETER_GRID: np.ndarray = np.linspace(0.01, 0.49, 49)
+    DEFAULT_PARAMETER: float = 0.4
+
     def __init__(self, seeds: Dict[int, Seed], spread: float = 0.4):
+        super().__init__(list(seeds.keys()), [seed.position for seed in seeds.values()], spread)
         self.seeds: Dict[int, Seed] = seeds
-        self.spread: float = spread
 
-    def predict_proba(self, samples: [Sample]):
-        probabilities = []
-        for sample in samples:
-            team_1_seed_position: int = self.seeds[sample.team_1_id].position
-            team_2_seed_position: int = self.seeds[sample.team_2_id].position
+    @property
+    def spread(self) -> float:
+        return self.parameter
+
+    @staticmethod
+    def probability(differences: np.ndarray, parameter):
+        return np.clip(0.5 - differences * parameter / 15, 1e-3, 1 - 1e-3)
+
+
+class SeedsLogisticClassifier(TeamValuesClassifier):
+    """
+    Logistic model on the seeds difference: 1 / (1 + exp(scale * (team_1 seed - team_2 seed))).
+    """
+
+    PARAMETER_GRID: np.ndarray = np.linspace(0.01, 1, 100)
+    DEFAULT_PARAMETER: float = 0.15
+
+    def __init__(self, seeds: Dict[int, Seed], scale: float = None):
+        super().__init__(list(seeds.keys()), [seed.position for seed in seeds.values()], scale)
+
+    @staticmethod
+    def probability(differences: np.ndarray, parameter):
+        return 1 / (1 + np.exp(differences * parameter))
+
+
+class RatingDifferenceClassifier(TeamValuesClassifier):
+    """
+    Logistic model on the difference of a per-team rating, where higher is better (e.g. the regular season
+    average score gap): 1 / (1 + exp(-scale * (team_1 rating - team_2 rating))).
+    """
+
+    PARAMETER_GRID: np.ndarray = np.linspace(0.005, 0.5, 100)
+    DEFAULT_PARAMETER: float = 0.1
 
-            seeds_difference = -1 * (team_1_seed_position - team_2_seed_position)
-            team_1_win_probability = 0.5 + seeds_difference * (self.spread / 15)
+    def __init__(self, team_ids, ratings, scale: float = None):
+        super().__init__(team_ids, ratings, scale)
 
-            probabilities.append([1 - team_1_win_probability, team_1_win_probability])
\ No newline at end of file
+    @staticmethod
+    def probability(differences: np.ndarray, parameter):
+        return 1 / (1 + np.exp(-1 * differences * parameter))
@@ -0,0 +1,225 @@
+import itertools
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Tuple
+
+import numpy as np
+
+from classifier import Classifier
+from profiler import profiler
+from sample import Sample
+from span import Span
+
+# Probabilities are clipped away from 0 and 1 before taking logs, as the Kaggle scorer does.
+EPSILON = 1e-15
+
+
+def _log_losses(win_p: np.ndarray, labels: np.ndarray) -> np.ndarray:
+    # Column-wise log losses: one column per model, or per candidate blend.
+    win_p = np.clip(win_p, EPSILON, 1 - EPSILON)
+    labels = labels[:, np.newaxis]
+    return -1 * np.mean(labels * np.log(win_p) + (1 - labels) * np.log(1 - win_p), axis=0)
+
+
+def _logits(win_p: np.ndarray) -> np.ndarray:
+    win_p = np.clip(win_p, EPSILON, 1 - EPSILON)
+    return np.log(win_p) - np.log(1 - win_p)
+
+
+class EnsembleClassifier(Classifier):
+    """
+    Combines the win probabilities of several fitted classifiers, either:
+    - "blend": a weighted average of the probabilities, weights on the simplex;
+    - "stack": a logistic regression on the probabilities' logits.
+
+    Base classifiers need to predict from a feature matrix (predict_proba_features), so that the features are
+    built once for all of them.
+    """
+
+    def __init__(self, classifiers: [Classifier], method: str = "blend", weights: np.ndarray = None,
+                 intercept: float = 0.0):
+        assert method in ("blend", "stack"), f"Unknown ensemble method {method}."
+        self.classifiers: [Classifier] = classifiers
+        self.method: str = method
+        # Equal weights by default.
+        self.weights: np.ndarray = np.full(len(classifiers), 1 / len(classifiers)) if weights is None else weights
+        self.intercept: float = intercept
+
+    def predict_proba(self, samples: [Sample]):
+        return self.predict_proba_features([sample.features for sample in samples])
+
+    def predict_proba_features(self, features) -> np.ndarray:
+        win_p = self.combine(self.get_base_probabilities(features))
+        return np.column_stack([1 - win_p, win_p])
+
+    """
+    Returns the matrix of win probabilities of team_1, one column per base classifier.
+    """
+
+    def get_base_probabilities(self, features) -> np.ndarray:
+        return np.column_stack([np.asarray(classifier.predict_proba_features(features))[:, 1]
+                                for classifier in self.classifiers])
+
+    def combine(self, probabilities: np.ndarray) -> np.ndarray:
+        if self.method == "blend":
+            return probabilities @ self.weights
+        return 1 / (1 + np.exp(-1 * (_logits(probabilities) @ self.weights + self.intercept)))
+
+
+class StackingEnsemble:
+    """
+    Trains several classifier types on a span and combines them into an EnsembleClassifier, instead of comparing
+    MLP, LR and GB submissions by hand.
+
+    Seasons are split into folds of consecutive seasons. For each fold and each classifier type, a classifier is
+    fitted on the other folds and predicts the fold's tournament match-ups: that gives, for every season, an
+    out-of-fold matrix of win probabilities (one column per classifier type), which no model saw during its fit.
+    All fits (folds and final fits on the whole span) are independent and run in parallel worker processes; only
+    the feature matrices travel to the workers.
+
+    The blend weights (or the stacker coefficients) are then fitted on the out-of-fold matrices, which are computed
+    once: every candidate blend is evaluated on them with matrix products, nothing is predicted again.
+
+    E.g. ensemble = StackingEnsemble(train_span, ["MLP", "LR", "GB"], max_iter=1000)
+         classifier = ensemble.fit()
+         ensemble.get_out_of_fold_scores()  # Log loss of each classifier type and of the ensemble.
+    """
+
+    def __init__(self, span: Span, classifier_types: [str] = ("MLP", "LR", "GB"), max_iter: int = 1000,
+                 method: str = "blend", folds: int = 5, max_workers: int = None):
+        assert method in ("blend", "stack"), f"Unknown ensemble method {method}."
+        self.span: Span = span
+        self.classifier_types: [str] = list(classifier_types)
+        self.max_iter: int = max_iter
+        self.method: str = method
+        self.folds: int = min(folds, len(span.seasons))
+        self.max_workers: int = max_workers
+        self.logger = self._get_logger()
+
+        # Out-of-fold win probabilities (match-ups x classifier types) and labels, by season.
+        self.out_of_fold: Dict[int, np.ndarray] = {}
+        self.labels: Dict[int, np.ndarray] = {}
+        self.classifier: EnsembleClassifier = None
+
+    @staticmethod
+    def _get_logger():
+        return logging.getLogger(__name__)
+
+    @profiler.profiled("ensemble.fit")
+    def fit(self) -> EnsembleClassifier:
+        assert self.folds >= 2, "At least two seasons are needed for out-of-fold predictions."
+
+        years = self.span.years
+        seasons_features: Dict[int, np.ndarray] = {}
+        for season in self.span.seasons:
+            season_features, season_labels = season.get_season_features_and_labels()
+            seasons_features[season.year] = np.asarray(season_features, dtype=np.float64)
+            self.labels[season.year] = np.asarray(season_labels, dtype=np.float64)
+        profiler.count(sum(len(labels) for labels in self.labels.values()))
+
+        folds_years = [list(fold) for fold in np.array_split(years, self.folds)]
+
+        def stack(fold_years: [int]) -> Tuple[np.ndarray, np.ndarray]:
+            return np.concatenate([seasons_features[year] for year in fold_years]), \
+                np.concatenate([self.labels[year] for year in fold_years])
+
+        with ProcessPoolExecutor(max_workers=self.max_workers) as executor:
+            folds_futures = []
+            for fold_years in folds_years:
+                train_features, train_labels = stack([year for year in years if year not in fold_years])
+                folds_futures.append([executor.submit(Span.fit_classifier, classifier_type, train_features,
+                                                      train_labels, self.max_iter)
+                                      for classifier_type in self.classifier_types])
+
+            span_features, span_labels = stack(years)
+            final_futures = [executor.submit(Span.fit_classifier, classifier_type, span_features, span_labels,
+                                             self.max_iter)
+                             for classifier_type in self.classifier_types]
+
+            for fold_years, futures in zip(folds_years, folds_futures):
+                fold_classifier = EnsembleClassifier([future.result() for future in futures])
+                for year in fold_years:
+                    self.out_of_fold[year] = fold_classifier.get_base_probabilities(seasons_features[year])
+            classifiers = [future.result() for future in final_futures]
+
+        probabilities, labels = self.get_out_of_fold_matrix()
+        if self.method == "blend":
+            self.classifier = EnsembleClassifier(classifiers, "blend", StackingEnsemble.fit_blend_weights(
+                probabilities, labels))
+        else:
+            weights, intercept = StackingEnsemble.fit_stacker(probabilities, labels)
+            self.classifier = EnsembleClassifier(classifiers, "stack", weights, intercept)
+
+        self.logger.info(f'Fitted {self.method} of {self.classifier_types}: weights {self.classifier.weights}.')
+        return self.classifier
+
+    """
+    Concatenates the out-of-fold matrices and labels of every season.
+    """
+
+    def get_out_of_fold_matrix(self) -> Tuple[np.ndarray, np.ndarray]:
+        years = sorted(self.out_of_fold)
+        return np.concatenate([self.out_of_fold[year] for year in years]), \
+            np.concatenate([self.labels[year] for year in years])
+
+    """
+    Returns the out-of-fold log loss of each classifier type, and of the fitted ensemble under "ensemble". The
+    ensemble's score is slightly optimistic: its own weights were fitted on those predictions.
+    """
+
+    def get_out_of_fold_scores(self) -> Dict[str, float]:
+        probabilities, labels = self.get_out_of_fold_matrix()
+        scores = dict(zip(self.classifier_types, _log_losses(probabilities, labels)))
+        if self.classifier is not None:
+            scores["ensemble"] = _log_losses(self.classifier.combine(probabilities)[:, np.newaxis], labels)[0]
+        return {name: float(score) for name, score in scores.items()}
+
+    """
+    Returns the blend weights minimizing the log loss of probabilities @ weights.
+
+    Candidates are all the weight vectors of the simplex grid with the given resolution (multiples of
+    1 / resolution summing up to 1): their blends are a single matrix product with the probabilities matrix,
+    evaluated by chunks of candidates to bound memory.
+    """
+
+    @staticmethod
+    def fit_blend_weights(probabilities: np.ndarray, labels: np.ndarray, resolution: int = 20,
+                          chunk_size: int = 1024) -> np.ndarray:
+        number_models = probabilities.shape[1]
+
+        # Stars and bars: each combination of number_models - 1 bars among resolution + number_models - 1 slots.
+        bars = np.array(list(itertools.combinations(range(resolution + number_models - 1), number_models - 1)),
+                        dtype=np.int64).reshape(-1, number_models - 1)
+        edges = np.column_stack([np.full(len(bars), -1), bars, np.full(len(bars), resolution + number_models - 1)])
+        candidates = (np.diff(edges, axis=1) - 1) / resolution
+
+        log_losses = np.concatenate([_log_losses(probabilities @ candidates[start:start + chunk_size].T, labels)
+                                     for start in range(0, len(candidates), chunk_size)])
+        return candidates[int(np.argmin(log_losses))]
+
+    """
+    Returns the coefficients and intercept of a logistic regression on the logits of the probabilities, fitted
+    with Newton's method (the design matrix has a column per model, so each step is a tiny linear solve). A small
+    L2 penalty keeps the solve well-conditioned when models are highly correlated.
+    """
+
+    @staticmethod
+    def fit_stacker(probabilities: np.ndarray, labels: np.ndarray, iterations: int = 50, l2: float = 1e-3,
+                    tolerance: float = 1e-10) -> Tuple[np.ndarray, float]:
+        design = np.column_stack([_logits(probabilities), np.ones(len(probabilities))])
+        penalty = l2 * np.eye(design.shape[1])
+        # Don't penalize the intercept.
+        penalty[-1, -1] = 0
+
+        # Averaging the models' logits is a sensible starting point.
+        coefficients = np.append(np.full(probabilities.shape[1], 1 / probabilities.shape[1]), 0.0)
+        for _ in range(iterations):
+            win_p = 1 / (1 + np.exp(-1 * (design @ coefficients)))
+            gradient = design.T @ (win_p - labels) / len(labels) + penalty @ coefficients
+            hessian = (design.T * (win_p * (1 - win_p))) @ design / len(labels) + penalty
+            step = np.linalg.solve(hessian, gradient)
+            coefficients -= step
+            if np.abs(step).max() < tolerance:
+                break
+
+        return coefficients[:-1], float(coefficients[-1])
@@ -0,0 +1,242 @@
+import hashlib
+import json
+import logging
+import sqlite3
+import time
+from datetime import datetime, timezone
+from typing import Dict
+
+import numpy as np
+
+from profiler import profiler
+from span import Span
+
+# Bumped whenever the way runs are keyed or stored changes, so older runs aren't mistaken for current ones.
+FORMAT_VERSION = 1
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    key TEXT PRIMARY KEY,
+    config TEXT NOT NULL,
+    classifier_type TEXT NOT NULL,
+    train_years TEXT NOT NULL,
+    test_years TEXT NOT NULL,
+    feature_layout TEXT NOT NULL,
+    data_hash TEXT NOT NULL,
+    average_score REAL NOT NULL,
+    train_time REAL NOT NULL,
+    predict_time REAL NOT NULL,
+    created_at TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS scores (
+    key TEXT NOT NULL REFERENCES runs (key),
+    year INTEGER NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (key, year)
+);
+CREATE TABLE IF NOT EXISTS predictions (
+    key TEXT NOT NULL REFERENCES runs (key),
+    year INTEGER NOT NULL,
+    team_1_ids BLOB NOT NULL,
+    team_2_ids BLOB NOT NULL,
+    win_p BLOB NOT NULL,
+    PRIMARY KEY (key, year)
+);
+"""
+
+
+class ExperimentStore:
+    """
+    Local SQLite store of train -> predict -> score runs, so that configurations already evaluated aren't rerun,
+    and past runs can be compared.
+
+    A run is keyed by a hash of:
+    - its configuration: train and test years, classifier type, max_iter and any other option given;
+    - the data version: the hash of the training data (Span.get_data_hash) and of the test seasons' prediction
+      features (Season.get_prediction_data);
+    - the feature version: the feature layout.
+    Changing the data files or the features therefore gives a new key instead of returning stale scores.
+
+    Each run stores its per-season scores, train and predict timings, and optionally its predictions.
+
+    E.g. store = ExperimentStore("experiments.sqlite")
+         run = store.run(train_span, test_span, max_iter=1000)  # Instant if that run is already stored.
+         store.query(classifier_type="LR", limit=5)  # Best 5 LR runs.
+    """
+
+    def __init__(self, path: str = "experiments.sqlite"):
+        self.path: str = path
+        self.connection: sqlite3.Connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.executescript(SCHEMA)
+        self.logger = self._get_logger()
+
+    @staticmethod
+    def _get_logger():
+        return logging.getLogger(__name__)
+
+    def close(self):
+        self.connection.close()
+
+    """
+    Returns the key of a run. Builds the test seasons' prediction features if they weren't built yet (the seasons
+    cache them, so the run predicts from them), and the training data if the train span holds none (see
+    Span.get_data_hash).
+    """
+
+    @staticmethod
+    def get_key(train_span: Span, test_span: Span, config: Dict) -> str:
+        test_digest = hashlib.sha256()
+        for season in test_span.seasons:
+            team_1_ids, team_2_ids, features, labels = season.get_prediction_data()
+            for values in (team_1_ids, team_2_ids, features, labels):
+                test_digest.update(values.tobytes())
+
+        content = {
+            "format_version": FORMAT_VERSION,
+            "config": config,
+            "train_data_hash": train_span.get_data_hash(),
+            "test_data_hash": test_digest.hexdigest(),
+            "feature_layout": train_span.feature_layout,
+        }
+        return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+    """
+    Returns the configuration of a run on the given spans: the spans' years and classifier type, plus the options.
+    """
+
+    @staticmethod
+    def get_config(train_span: Span, test_span: Span, **options) -> Dict:
+        return dict(options, classifier_type=train_span.classifier_type, train_years=train_span.years,
+                    test_years=test_span.years)
+
+    """
+    Trains on the train span, predicts and scores the test span, and stores the run. If the same run (same key)
+    is already stored, returns it without training.
+
+    Extra options are part of the configuration, hence of the key (e.g. a gender, or a note on a code change
+    which the data and features don't capture).
+    """
+
+    @profiler.profiled("experiments.run")
+    def run(self, train_span: Span, test_span: Span, max_iter: int = 1000, store_predictions: bool = False,
+            **options) -> Dict:
+        config = ExperimentStore.get_config(train_span, test_span, max_iter=max_iter, **options)
+        # The training data is built once: hashed into the key, then fitted if the run isn't stored yet.
+        train_span.features, train_span.labels = train_span.get_features_and_labels()
+        key = ExperimentStore.get_key(train_span, test_span, config)
+
+        run = self.get(key)
+        if run is not None and (run["has_predictions"] or not store_predictions):
+            self.logger.info(f'Run {key[:12]} already stored.')
+            return run
+
+        start = time.perf_counter()
+        classifier = Span.fit_classifier(train_span.classifier_type, train_span.features, train_span.labels, max_iter)
+        train_time = time.perf_counter() - start
+
+        start = time.perf_counter()
+        span_predictions = test_span.predict(test_span.build_seasons_classifiers_map(classifier))
+        predict_time = time.perf_counter() - start
+
+        self.save(key, config, train_span, Span.score(span_predictions), train_time, predict_time,
+                  span_predictions if store_predictions else None)
+        return self.get(key)
+
+    def save(self, key: str, config: Dict, train_span: Span, scores: Dict, train_time: float, predict_time: float,
+             span_predictions: Dict = None):
+        with self.connection:
+            self.connection.execute("DELETE FROM scores WHERE key = ?", (key,))
+            self.connection.execute("DELETE FROM predictions WHERE key = ?", (key,))
+            self.connection.execute(
+                "INSERT OR REPLACE INTO runs VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (key, json.dumps(config, sort_keys=True), config["classifier_type"],
+                 json.dumps(config["train_years"]), json.dumps(config["test_years"]),
+                 json.dumps(train_span.feature_layout), train_span.get_data_hash(), scores["Average"], train_time,
+                 predict_time, datetime.now(timezone.utc).isoformat()))
+            self.connection.executemany("INSERT INTO scores VALUES (?, ?, ?)",
+                                        [(key, year, score) for year, score in scores.items() if year != "Average"])
+
+            for year, season_predictions in (span_predictions or {}).items():
+                self.connection.execute("INSERT INTO predictions VALUES (?, ?, ?, ?, ?)", (
+                    key, year,
+                    np.array([sample.team_1_id for sample in season_predictions], dtype=np.int64).tobytes(),
+                    np.array([sample.team_2_id for sample in season_predictions], dtype=np.int64).tobytes(),
+                    np.array([sample.win_p for sample in season_predictions], dtype=np.float64).tobytes()))
+
+    """
+    Returns a stored run: its configuration, per-season scores ("Average" included, like Span.score) and timings.
+    None if there is no such run.
+    """
+
+    def get(self, key: str) -> Dict:
+        row = self.connection.execute("SELECT * FROM runs WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        return self._to_run(row)
+
+    def _to_run(self, row: sqlite3.Row) -> Dict:
+        scores = {year: score for year, score in self.connection.execute(
+            "SELECT year, score FROM scores WHERE key = ? ORDER BY year", (row["key"],))}
+        scores["Average"] = row["average_score"]
+        has_predictions = self.connection.execute("SELECT 1 FROM predictions WHERE key = ? LIMIT 1",
+                                                  (row["key"],)).fetchone() is not None
+        return {
+            "key": row["key"],
+            "config": json.loads(row["config"]),
+            "feature_layout": json.loads(row["feature_layout"]),
+            "data_hash": row["data_hash"],
+            "scores": scores,
+            "train_time": row["train_time"],
+            "predict_time": row["predict_time"],
+            "created_at": row["created_at"],
+            "has_predictions": has_predictions,
+        }
+
+    """
+    Returns the stored predictions of a run, by year: arrays of team_1 IDs, team_2 IDs and win probabilities.
+    """
+
+    def get_predictions(self, key: str) -> Dict[int, Dict[str, np.ndarray]]:
+        return {year: {"team_1_ids": np.frombuffer(team_1_ids, dtype=np.int64),
+                       "team_2_ids": np.frombuffer(team_2_ids, dtype=np.int64),
+                       "win_p": np.frombuffer(win_p, dtype=np.float64)}
+                for year, team_1_ids, team_2_ids, win_p in self.connection.execute(
+                    "SELECT year, team_1_ids, team_2_ids, win_p FROM predictions WHERE key = ? ORDER BY year", (key,))}
+
+    """
+    Returns stored runs ranked by average score (best first), optionally filtered by classifier type and by the
+    exact train and test years.
+    """
+
+    def query(self, classifier_type: str = None, train_years: [int] = None, test_years: [int] = None,
+              limit: int = None) -> [Dict]:
+        conditions, parameters = [], []
+        for column, value in [("classifier_type", classifier_type), ("train_years", train_years),
+                              ("test_years", test_years)]:
+            if value is not None:
+                conditions.append(f"{column} = ?")
+                parameters.append(value if column == "classifier_type" else json.dumps(list(value)))
+
+        statement = "SELECT * FROM runs"
+        if conditions:
+            statement += " WHERE " + " AND ".join(conditions)
+        statement += " ORDER BY average_score"
+        if limit is not None:
+            statement += " LIMIT ?"
+            parameters.append(limit)
+
+        return [self._to_run(row) for row in self.connection.execute(statement, parameters)]
+
+    """
+    Returns a year -> {run key: score} table comparing the given runs season by season.
+    """
+
+    def compare(self, keys: [str]) -> Dict:
+        table: Dict = {}
+        for key in keys:
+            run = self.get(key)
+            assert run is not None, f"No run {key}."
+            for year, score in run["scores"].items():
+                table.setdefault(year, {})[key] = score
+        return table
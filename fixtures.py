@@ -0,0 +1,229 @@
+import argparse
+import os
+import random
+from typing import Dict
+
+from bracket import BRACKET_ORDER, REGIONS
+
+# Day numbers of the tournament rounds, relative to each season's day zero.
+TOURNAMENT_DAYS = [136, 138, 143, 145, 152, 154]
+
+COMPACT_HEADER = ["Season", "DayNum", "WTeamID", "WScore", "LTeamID", "LScore", "WLoc", "NumOT"]
+
+BOX_SCORE_STATS = ["FGM", "FGA", "FGM3", "FGA3", "FTM", "FTA", "OR", "DR", "Ast", "TO", "Stl", "Blk", "PF"]
+
+DETAILED_HEADER = COMPACT_HEADER + ["W" + stat for stat in BOX_SCORE_STATS] + ["L" + stat for stat in BOX_SCORE_STATS]
+
+# First team ID of each gender, as in the Kaggle data: men's and women's IDs never overlap in a merged submission.
+FIRST_TEAM_IDS = {"M": 1101, "W": 3101}
+
+
+class FixtureGenerator:
+    """
+    Writes self-contained data files in the Kaggle schema, which the Parser reads unchanged. The resources CSV
+    files are Git LFS pointers: fixtures let us run and measure the pipeline without them, and at sizes the real
+    data doesn't reach (more teams, more seasons, full ranking histories).
+
+    The number of teams, seasons, games per team, ranking systems and ranking days are parameters. Ranking systems
+    are written for every ranking day; the Parser only keeps the final pre-tournament day (133).
+
+    Outcomes are drawn from a latent-strength model: each team gets a normally distributed strength every season,
+    and the margin of a game is the strength difference plus a home court advantage plus normal noise. Tournament
+    seeds and rankings are noisy orderings of those strengths, so features carry actual signal.
+
+    The same seed always generates the same files.
+    """
+
+    def __init__(self, number_teams: int = 120, first_season: int = 2003, number_seasons: int = 6,
+                 games_per_team: int = 25, seed: int = 0, ranking_systems: [str] = ("MOR",),
+                 ranking_days: [int] = (133,)):
+        assert number_teams >= 64, "At least 64 teams are needed to fill a tournament bracket."
+        assert 133 in ranking_days, "The Parser reads the final pre-tournament rankings, on day 133."
+
+        self.number_teams: int = number_teams
+        self.first_season: int = first_season
+        self.number_seasons: int = number_seasons
+        self.games_per_team: int = games_per_team
+        self.seed: int = seed
+        self.ranking_systems: [str] = list(ranking_systems)
+        self.ranking_days: [int] = sorted(ranking_days)
+
+        self.years: [int] = list(range(first_season, first_season + number_seasons))
+
+    def get_team_ids(self, gender: str) -> [int]:
+        return [FIRST_TEAM_IDS[gender] + idx for idx in range(self.number_teams)]
+
+    def write(self, path: str, gender: str = "M"):
+        os.makedirs(path, exist_ok=True)
+        generator = random.Random(f"{self.seed}_{gender}")
+
+        self._write_teams(path, gender)
+        self._write_seasons(path, gender)
+
+        regular_season_rows, tournament_rows, seeds_rows, rankings_rows = [], [], [], []
+        for year in self.years:
+            strengths = {team_id: generator.gauss(0, 8) for team_id in self.get_team_ids(gender)}
+            regular_season_rows.extend(self._regular_season_games(generator, year, strengths))
+
+            # No tournament took place in 2020.
+            if year == 2020:
+                continue
+
+            seeds = self._seeds(generator, strengths)
+            seeds_rows.extend([year, seed, team_id] for seed, team_id in seeds.items())
+            rankings_rows.extend(self._rankings(generator, year, strengths))
+
+            # The Parser expects no tournament results for the 2022 season, the one to predict.
+            if year != 2022:
+                tournament_rows.extend(self._tournament_games(generator, year, strengths, seeds))
+
+        self._write_csv(path, gender + "RegularSeasonCompactResults.csv", COMPACT_HEADER,
+                        [row[:len(COMPACT_HEADER)] for row in regular_season_rows])
+        self._write_csv(path, gender + "RegularSeasonDetailedResults.csv", DETAILED_HEADER, regular_season_rows)
+        self._write_csv(path, gender + "NCAATourneyCompactResults.csv", COMPACT_HEADER,
+                        [row[:len(COMPACT_HEADER)] for row in tournament_rows])
+        self._write_csv(path, gender + "NCAATourneyDetailedResults.csv", DETAILED_HEADER, tournament_rows)
+        self._write_csv(path, gender + "NCAATourneySeeds.csv", ["Season", "Seed", "TeamID"], seeds_rows)
+        if gender == "M":
+            self._write_csv(path, gender + "MasseyOrdinals.csv",
+                            ["Season", "RankingDayNum", "SystemName", "TeamID", "OrdinalRank"], rankings_rows)
+
+    def _write_teams(self, path: str, gender: str):
+        # Women's teams don't have division 1 season columns.
+        if gender == "M":
+            header = ["TeamID", "TeamName", "FirstD1Season", "LastD1Season"]
+            rows = [[team_id, f"Team {team_id}", self.years[0], self.years[-1]] for team_id in self.get_team_ids(gender)]
+        else:
+            header = ["TeamID", "TeamName"]
+            rows = [[team_id, f"Team {team_id}"] for team_id in self.get_team_ids(gender)]
+        self._write_csv(path, gender + "Teams.csv", header, rows)
+
+    def _write_seasons(self, path: str, gender: str):
+        rows = [[year, f"11/01/{year - 1}", "East", "West", "Midwest", "South"] for year in self.years]
+        self._write_csv(path, gender + "Seasons.csv", ["Season", "DayZero", "RegionW", "RegionX", "RegionY",
+                                                       "RegionZ"], rows)
+
+    @staticmethod
+    def _write_csv(path: str, file_name: str, header: [str], rows: [[]]):
+        with open(os.path.join(path, file_name), 'w') as f:
+            f.write(",".join(header))
+            f.write('\n')
+            for row in rows:
+                f.write(",".join(str(value) for value in row))
+                f.write('\n')
+
+    """
+    Returns a game row in the detailed results schema: the compact results columns followed by both teams' box
+    scores. Compact rows are the prefix of detailed rows.
+    """
+
+    @staticmethod
+    def _game(generator: random.Random, year: int, day_num: int, team_1_id: int, team_2_id: int,
+              strengths: Dict[int, float], location: str) -> [list]:
+        # Location is from team_1's point of view.
+        home_advantage = {"H": 3.5, "A": -3.5, "N": 0}[location]
+        margin = round(strengths[team_1_id] - strengths[team_2_id] + home_advantage + generator.gauss(0, 11))
+        num_ot = 0
+        while margin == 0:
+            num_ot += 1
+            margin = round(generator.gauss(0, 4))
+
+        loser_score = max(round(generator.gauss(66, 9)), 30)
+        winner_score = loser_score + abs(margin)
+        box_scores = FixtureGenerator._box_score(generator, winner_score) + \
+            FixtureGenerator._box_score(generator, loser_score)
+        if margin > 0:
+            return [year, day_num, team_1_id, winner_score, team_2_id, loser_score, location, num_ot] + box_scores
+        w_loc = {"H": "A", "A": "H", "N": "N"}[location]
+        return [year, day_num, team_2_id, winner_score, team_1_id, loser_score, w_loc, num_ot] + box_scores
+
+    """
+    Returns box score stats consistent with the score: 2 * (FGM - FGM3) + 3 * FGM3 + FTM = score.
+    """
+
+    @staticmethod
+    def _box_score(generator: random.Random, score: int) -> [int]:
+        fgm3 = min(generator.randint(3, 11), score // 4)
+        ftm = min(generator.randint(6, 20), score - 3 * fgm3)
+        # Two-point field goals need an even number of points left.
+        if (score - 3 * fgm3 - ftm) % 2 == 1:
+            ftm -= 1
+        fgm = (score - 3 * fgm3 - ftm) // 2 + fgm3
+        fga = fgm + generator.randint(25, 40)
+        fga3 = fgm3 + generator.randint(8, 16)
+        fta = ftm + generator.randint(0, 8)
+        return [fgm, fga, fgm3, fga3, ftm, fta, generator.randint(5, 16), generator.randint(18, 30),
+                generator.randint(8, 20), generator.randint(8, 18), generator.randint(3, 10),
+                generator.randint(1, 6), generator.randint(12, 22)]
+
+    def _regular_season_games(self, generator: random.Random, year: int, strengths: Dict[int, float]) -> [list]:
+        rows = []
+        # Each game involves two teams.
+        team_ids = list(strengths)
+        for _ in range(self.number_teams * self.games_per_team // 2):
+            team_1_id, team_2_id = generator.sample(team_ids, 2)
+            location = generator.choices(["H", "A", "N"], weights=[0.45, 0.45, 0.1])[0]
+            rows.append(self._game(generator, year, generator.randint(1, 132), team_1_id, team_2_id, strengths,
+                                   location))
+        rows.sort(key=lambda row: row[1])
+        return rows
+
+    @staticmethod
+    def _noisy_order(generator: random.Random, strengths: Dict[int, float], noise: float) -> [int]:
+        return sorted(strengths, key=lambda team_id: -1 * (strengths[team_id] + generator.gauss(0, noise)))
+
+    def _seeds(self, generator: random.Random, strengths: Dict[int, float]) -> Dict[str, int]:
+        # The 64 best teams (noisily) make the tournament. Seed lines are filled in snake order across regions.
+        qualified_teams_ids = self._noisy_order(generator, strengths, 3)[:64]
+        seeds: Dict[str, int] = {}
+        for idx, team_id in enumerate(qualified_teams_ids):
+            position, region_idx = divmod(idx, 4)
+            region = REGIONS[region_idx if position % 2 == 0 else 3 - region_idx]
+            seeds[f"{region}{position + 1:02d}"] = team_id
+        return seeds
+
+    def _rankings(self, generator: random.Random, year: int, strengths: Dict[int, float]) -> [list]:
+        rows = []
+        for day_num in self.ranking_days:
+            # Rankings get more accurate as the season goes on.
+            noise = 2 + 4 * (133 - day_num) / 133
+            for system_name in self.ranking_systems:
+                order = self._noisy_order(generator, strengths, noise)
+                rows.extend([year, day_num, system_name, team_id, rank + 1] for rank, team_id in enumerate(order))
+        return rows
+
+    def _tournament_games(self, generator: random.Random, year: int, strengths: Dict[int, float],
+                          seeds: Dict[str, int]) -> [list]:
+        rows = []
+        alive = [seeds[f"{region}{position:02d}"] for region in REGIONS for position in BRACKET_ORDER]
+        for day_num in TOURNAMENT_DAYS:
+            winners = []
+            for idx in range(0, len(alive), 2):
+                row = self._game(generator, year, day_num, alive[idx], alive[idx + 1], strengths, "N")
+                rows.append(row)
+                winners.append(row[2])
+            alive = winners
+        return rows
+
+
+def main(argv: [str] = None):
+    arguments_parser = argparse.ArgumentParser(prog="fixtures", description="Write Kaggle-schema fixtures.")
+    arguments_parser.add_argument("path", help="Directory to write the CSV files to.")
+    arguments_parser.add_argument("--genders", nargs="+", default=["M", "W"], choices=["M", "W"])
+    arguments_parser.add_argument("--teams", type=int, default=120)
+    arguments_parser.add_argument("--first-season", type=int, default=2003)
+    arguments_parser.add_argument("--seasons", type=int, default=6)
+    arguments_parser.add_argument("--games-per-team", type=int, default=25)
+    arguments_parser.add_argument("--seed", type=int, default=0)
+    arguments_parser.add_argument("--ranking-systems", nargs="+", default=["MOR"])
+    arguments_parser.add_argument("--ranking-days", nargs="+", type=int, default=[133])
+    args = arguments_parser.parse_args(argv)
+
+    generator = FixtureGenerator(args.teams, args.first_season, args.seasons, args.games_per_team, args.seed,
+                                 args.ranking_systems, args.ranking_days)
+    for gender in args.genders:
+        generator.write(args.path, gender)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,119 @@
+from typing import Union
+
+import numpy as np
+
+from game import Game
+from schedule import TeamGamesIndex
+
+# Weights of a win depending on the winner's location, as in RegularSeason.adjusted_nb_wins: road wins count more.
+LOCATION_WEIGHTS = {"H": 0.6, "A": 1.4, "N": 1.0}
+
+
+class FormWindow:
+    """
+    Aggregates of a window of games, for every team: arrays indexed by the dense indices of the team registry, with
+    an extra leading axis when several window sizes are queried at once.
+    """
+
+    def __init__(self, number_games: np.ndarray, margin: np.ndarray, wins: np.ndarray, adjusted_wins: np.ndarray):
+        self.number_games: np.ndarray = number_games
+        self.margin: np.ndarray = margin
+        self.wins: np.ndarray = wins
+        self.adjusted_wins: np.ndarray = adjusted_wins
+
+    def _average(self, totals: np.ndarray) -> np.ndarray:
+        # Teams without games in the window average to 0.
+        return np.where(self.number_games > 0, totals / np.maximum(self.number_games, 1), 0)
+
+    @property
+    def average_margin(self) -> np.ndarray:
+        return self._average(self.margin)
+
+    @property
+    def win_pct(self) -> np.ndarray:
+        return self._average(self.wins)
+
+    @property
+    def adjusted_win_pct(self) -> np.ndarray:
+        return self._average(self.adjusted_wins)
+
+
+class RecentForm:
+    """
+    Windowed aggregates of a season's games (margin, wins, location-adjusted wins), so that recent games can weigh
+    differently than games played in November.
+
+    Prefix sums over the entries of the season's TeamGamesIndex (each team's games, sorted by day number, laid out
+    contiguously team after team) give the aggregate of any contiguous range of a team's games with one
+    subtraction. On top of it, a teams x days table counts each team's games played before each day, which turns
+    day windows into game ranges.
+
+    Any window is then O(1) per team, and windows are computed for all teams (and all window sizes) at once:
+    - last_games(10): each team's last 10 games;
+    - last_days(30): games of the last 30 days of the regular season;
+    - between_days(100): games on or after day 100 (e.g. after the start of conference play).
+    """
+
+    def __init__(self, games: [Game], index: TeamGamesIndex):
+        margins = np.array([game.w_score - game.l_score for game in games], dtype=float)
+        location_weights = np.array([LOCATION_WEIGHTS.get(game.w_loc, 0.0) for game in games], dtype=float)
+
+        def prefix_sums(entries_values: np.ndarray) -> np.ndarray:
+            return np.concatenate([[0], np.cumsum(entries_values)])
+
+        # Entries of the index are already sorted by team, then day.
+        self.margin_sums: np.ndarray = prefix_sums(index.get_entries_values(margins, negate_for_losers=True))
+        self.wins_sums: np.ndarray = prefix_sums(index.won.astype(float))
+        self.adjusted_wins_sums: np.ndarray = prefix_sums(index.get_entries_values(location_weights,
+                                                                                   negate_for_losers=True))
+        self.offsets: np.ndarray = index.offsets
+
+        # games_before[t, d]: number of games team t played strictly before day d.
+        self.last_day: int = int(index.days.max()) if len(games) else 0
+        entries_team = np.repeat(np.arange(len(index.offsets) - 1), np.diff(index.offsets))
+        per_day = np.zeros((len(index.offsets) - 1, self.last_day + 2), dtype=np.int64)
+        np.add.at(per_day, (entries_team, index.days + 1), 1)
+        self.games_before: np.ndarray = np.cumsum(per_day, axis=1)
+
+    """
+    Aggregates entries start to end (excluded), arrays of the same shape, into a FormWindow.
+    """
+
+    def _window(self, start: np.ndarray, end: np.ndarray) -> FormWindow:
+        return FormWindow(end - start, self.margin_sums[end] - self.margin_sums[start],
+                          self.wins_sums[end] - self.wins_sums[start],
+                          self.adjusted_wins_sums[end] - self.adjusted_wins_sums[start])
+
+    """
+    Each team's last number_games games (or fewer, if the team played fewer). Accepts a single size or an array
+    of sizes, in which case the window arrays are sizes x teams.
+    """
+
+    def last_games(self, number_games: Union[int, np.ndarray]) -> FormWindow:
+        sizes = np.asarray(number_games, dtype=np.int64)[..., np.newaxis]
+        end = np.broadcast_to(self.offsets[1:], np.broadcast(sizes, self.offsets[1:]).shape)
+        start = np.maximum(self.offsets[:-1], end - sizes)
+        return self._window(start, end)
+
+    """
+    Games played from first_day to last_day (both included, last_day defaults to the end of the regular season).
+    Accepts single days or arrays of days, like last_games.
+    """
+
+    def between_days(self, first_day: Union[int, np.ndarray], last_day: Union[int, np.ndarray] = None) -> FormWindow:
+        last_day = self.last_day if last_day is None else last_day
+        first_day = np.clip(np.asarray(first_day, dtype=np.int64), 0, self.last_day + 1)
+        last_day = np.clip(np.asarray(last_day, dtype=np.int64), -1, self.last_day)
+
+        # Rows of the transposed table are days: indexing by days arrays gives days x teams arrays.
+        games_before = self.games_before.T
+        start = self.offsets[:-1] + games_before[first_day]
+        end = self.offsets[:-1] + games_before[last_day + 1]
+        return self._window(start, np.maximum(start, end))
+
+    """
+    Games of the last number_days days of the regular season.
+    """
+
+    def last_days(self, number_days: Union[int, np.ndarray]) -> FormWindow:
+        return self.between_days(self.last_day + 1 - np.asarray(number_days, dtype=np.int64))
@@ -0,0 +1,209 @@
+import logging
+import os
+from typing import Dict
+
+import numpy as np
+
+from classifier import Classifier
+from form import LOCATION_WEIGHTS
+from profiler import profiler
+from season import Season
+from span import Span
+
+
+class PredictionGrid:
+    """
+    Win probabilities of every pair of division 1 teams active in a season, not only the seeded ones: forecasts
+    before Selection Sunday, or ratings of bubble teams.
+
+    Active teams are those whose division 1 seasons (Team first/last D1 season) include the season, or the teams
+    which played a regular season game when those ranges are unknown (women's data). That's about 358 teams, so
+    about 64k pairs per season.
+
+    Season features rely on tournament seeds and on games between tournament teams only, which don't exist for
+    most teams. The grid has its own per-team statistics, computed over all the regular season games with array
+    operations, and its own feature layout (Season.get_feature_layout naming):
+    - absolute features: both teams' values of a per-team statistic;
+    - relative features ("<statistic>_diff"): the difference of team_1's and team_2's values.
+    A classifier for the grid is therefore trained on the grid features of past tournament games (train).
+
+    Pair features are built by indexing the per-team arrays with arrays of pair indices, and pairs are predicted by
+    chunks: memory stays bounded by the chunk size, whatever the number of teams. Probabilities are written to a
+    float32 teams x teams matrix on disk (see write).
+
+    E.g. grid_classifier = PredictionGrid.train(train_span.seasons)
+         PredictionGrid(seasons[2022]).write(grid_classifier, "grid_2022.npy")
+    """
+
+    # Per-team statistics available as features. "rankings" needs the final pre-tournament rankings (2003+, men).
+    STATISTICS: [str] = ["win_ratio", "gap_average", "adjusted_win_pct", "average_points_scored",
+                         "average_points_allowed", "recent_margin", "recent_win_pct", "late_season_margin",
+                         "rankings"]
+    ABSOLUTE_FEATURES: [str] = ["win_ratio", "gap_average", "adjusted_win_pct", "recent_margin"]
+    RELATIVE_FEATURES: [str] = ["gap_average_diff", "late_season_margin_diff"]
+
+    def __init__(self, season: Season, absolute_features: [str] = None, relative_features: [str] = None):
+        self.season: Season = season
+        self.absolute_features: [str] = list(absolute_features or PredictionGrid.ABSOLUTE_FEATURES)
+        self.relative_features: [str] = list(relative_features or PredictionGrid.RELATIVE_FEATURES)
+        self.logger = self._get_logger()
+
+        teams = season.teams
+        regular_season = season.regular_season
+        index = regular_season.games_index
+
+        # Teams with at least one regular season game, restricted to division 1 teams when known.
+        active = np.diff(index.offsets) > 0
+        d1_mask = teams.d1_mask(season.year)
+        if d1_mask is not None:
+            active &= d1_mask
+        self.team_ids: np.ndarray = teams.ids[active]
+        self.indices: np.ndarray = np.flatnonzero(active)
+
+        self.statistics: Dict[str, np.ndarray] = self._get_statistics()
+        for name in self.absolute_features + [name[:-len("_diff")] for name in self.relative_features]:
+            assert name in self.statistics, f"Unknown grid statistic {name}."
+
+    @staticmethod
+    def _get_logger():
+        return logging.getLogger(__name__)
+
+    """
+    Returns the per-team statistics over all the regular season games, as arrays indexed like team_ids.
+    """
+
+    def _get_statistics(self) -> Dict[str, np.ndarray]:
+        regular_season = self.season.regular_season
+        games = regular_season.regular_season_games
+        index = regular_season.games_index
+
+        w_score = np.array([game.w_score for game in games], dtype=float)
+        l_score = np.array([game.l_score for game in games], dtype=float)
+        location_weights = np.array([LOCATION_WEIGHTS.get(game.w_loc, 0.0) for game in games], dtype=float)
+
+        # Per-entry values (a game once per team, team after team), summed per team with the index's offsets.
+        def per_team(entries_values: np.ndarray) -> np.ndarray:
+            sums = np.concatenate([[0], np.cumsum(entries_values)])
+            return (sums[index.offsets[1:]] - sums[index.offsets[:-1]])[self.indices]
+
+        number_games = np.maximum(np.diff(index.offsets)[self.indices], 1)
+        scored = np.where(index.won, w_score[index.positions], l_score[index.positions])
+        allowed = np.where(index.won, l_score[index.positions], w_score[index.positions])
+
+        statistics = {
+            "win_ratio": per_team(index.won.astype(float)) / number_games,
+            "gap_average": per_team(scored - allowed) / number_games,
+            "adjusted_win_pct": per_team(index.get_entries_values(location_weights, negate_for_losers=True))
+            / number_games,
+            "average_points_scored": per_team(scored) / number_games,
+            "average_points_allowed": per_team(allowed) / number_games,
+            "recent_margin": regular_season.recent_margin[self.indices],
+            "recent_win_pct": regular_season.recent_win_pct[self.indices],
+            "late_season_margin": regular_season.late_season_margin[self.indices],
+        }
+
+        # Unranked teams rank right after the last ranked team.
+        rankings = self.season.tournament.rankings.get("MOR")
+        if rankings:
+            worst = max(rankings.values()) + 1
+            statistics["rankings"] = np.array([rankings.get(team_id, worst) for team_id in self.team_ids.tolist()],
+                                              dtype=float)
+        return statistics
+
+    @property
+    def feature_layout(self) -> [str]:
+        return Season.get_feature_layout(self.absolute_features, self.relative_features)
+
+    """
+    Returns the features matrix of pairs of teams, given as arrays of positions in team_ids.
+    """
+
+    def get_features(self, team_1_positions: np.ndarray, team_2_positions: np.ndarray) -> np.ndarray:
+        columns = []
+        for name in self.absolute_features:
+            columns.extend([self.statistics[name][team_1_positions], self.statistics[name][team_2_positions]])
+        for name in self.relative_features:
+            values = self.statistics[name[:-len("_diff")]]
+            columns.append(values[team_1_positions] - values[team_2_positions])
+        return np.column_stack(columns)
+
+    """
+    Returns the positions of team IDs in team_ids. Raises a KeyError on teams which aren't active in the grid,
+    instead of silently using a neighbour's row.
+    """
+
+    def get_positions(self, team_ids) -> np.ndarray:
+        team_ids = np.asarray(team_ids, dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.team_ids, team_ids), len(self.team_ids) - 1)
+        unknown = self.team_ids[positions] != team_ids
+        if unknown.any():
+            raise KeyError(f"Unknown team IDs: {np.unique(team_ids[unknown]).tolist()}")
+        return positions
+
+    """
+    Returns the grid features and labels of the season's tournament games, both points of view of each game, like
+    Season.get_season_features_and_labels.
+    """
+
+    def get_features_and_labels(self):
+        w_team_ids, l_team_ids = self.season.get_tournament_games_ids()
+        w_positions, l_positions = self.get_positions(w_team_ids), self.get_positions(l_team_ids)
+        features = np.empty((2 * len(w_team_ids), len(self.feature_layout)))
+        features[0::2] = self.get_features(w_positions, l_positions)
+        features[1::2] = self.get_features(l_positions, w_positions)
+        labels = np.tile([1, 0], len(w_team_ids))
+        return features, labels
+
+    """
+    Trains a classifier on the grid features of the seasons' tournament games.
+    """
+
+    @staticmethod
+    @profiler.profiled("grid.train")
+    def train(seasons: [Season], classifier_type: str = "LR", max_iter: int = 1000, absolute_features: [str] = None,
+              relative_features: [str] = None) -> Classifier:
+        features, labels = [], []
+        for season in seasons:
+            season_features, season_labels = PredictionGrid(season, absolute_features,
+                                                            relative_features).get_features_and_labels()
+            features.append(season_features)
+            labels.append(season_labels)
+        return Span.fit_classifier(classifier_type, np.concatenate(features), np.concatenate(labels), max_iter)
+
+    """
+    Predicts every pair of active teams and writes the probabilities to path (.npy), as a float32 teams x teams
+    matrix: entry [i, j] is the probability that team_ids[i] beats team_ids[j], with 0.5 on the diagonal. The team
+    IDs are written next to it, to <path without .npy>_teams.npy.
+
+    The matrix is a memory-mapped file filled by chunks of rows holding at most chunk_size pairs: only one chunk of
+    features and probabilities is ever in memory. The classifier needs to predict from a features matrix
+    (predict_proba_features), and must have been trained on the grid's feature layout.
+    """
+
+    def write(self, classifier: Classifier, path: str, chunk_size: int = 65536) -> np.ndarray:
+        with profiler.stage("grid.write", year=self.season.year):
+            number_teams = len(self.team_ids)
+            matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(number_teams, number_teams))
+            matrix[np.diag_indices(number_teams)] = 0.5
+
+            # Row i holds number_teams - 1 - i pairs (i, j > i).
+            row_pairs = np.arange(number_teams - 1, -1, -1)
+            start = 0
+            while start < number_teams - 1:
+                end = start + max(1, int(np.searchsorted(np.cumsum(row_pairs[start:]), chunk_size, side="right")))
+                end = min(end, number_teams)
+
+                team_1_positions = np.repeat(np.arange(start, end), row_pairs[start:end])
+                team_2_positions = np.concatenate([np.arange(row + 1, number_teams) for row in range(start, end)])
+                win_p = np.asarray(classifier.predict_proba_features(
+                    self.get_features(team_1_positions, team_2_positions)))[:, 1].astype(np.float32)
+
+                matrix[team_1_positions, team_2_positions] = win_p
+                matrix[team_2_positions, team_1_positions] = 1 - win_p
+                profiler.count(len(win_p))
+                start = end
+
+            matrix.flush()
+            np.save(os.path.splitext(path)[0] + "_teams.npy", self.team_ids)
+            self.logger.info(f'Wrote {number_teams * (number_teams - 1) // 2} pairs for {self.season.year} to {path}.')
+        return matrix
@@ -0,0 +1,134 @@
+import json
+
+import numpy as np
+
+from classifier import Classifier, LogisticRegressionClassifier, NeuralNetworkClassifier
+from sample import Sample
+
+# Bumped whenever the on-disk layout changes, so older files are refused instead of misread.
+FORMAT_VERSION = 1
+
+ACTIVATIONS = {
+    "identity": lambda values: values,
+    "relu": lambda values: np.maximum(values, 0),
+    "tanh": np.tanh,
+    # Numerically stable logistic function: 1 / (1 + exp(-x)) = exp(-log(1 + exp(-x))).
+    "logistic": lambda values: np.exp(-1 * np.logaddexp(0, -1 * values)),
+}
+
+
+class NumpyClassifier(Classifier):
+    """
+    NumPy-only forward pass compiled from a fitted MLP or logistic regression classifier, scaler included.
+
+    Inference skips sklearn's validation layers, which dominate the cost of predicting one or a few match-ups at
+    a time, and doesn't need sklearn at all: exported files load with numpy alone.
+
+    A logistic regression is a network without hidden layers: a single linear layer followed by the logistic
+    output activation.
+
+    E.g. NumpyClassifier.from_classifier(train_span.train(50000)).save("mlp.npz")
+         classifier = NumpyClassifier.load("mlp.npz", test_span.feature_layout)
+    """
+
+    def __init__(self, scale: np.ndarray, offset: np.ndarray, weights: [np.ndarray], biases: [np.ndarray],
+                 activation: str, feature_layout: [str] = None):
+        assert activation in ACTIVATIONS, f"Unsupported activation {activation}."
+        assert len(weights) == len(biases), "Each layer needs weights and biases."
+
+        # MinMaxScaler.transform(X) = X * scale + offset.
+        self.scale: np.ndarray = scale
+        self.offset: np.ndarray = offset
+        self.weights: [np.ndarray] = weights
+        self.biases: [np.ndarray] = biases
+        self.activation: str = activation
+        self.feature_layout: [str] = feature_layout
+
+        self._hidden_activation = ACTIVATIONS[activation]
+        self._output_activation = ACTIVATIONS["logistic"]
+
+    """
+    Compiles a fitted classifier wrapper. Reads the fitted attributes of the estimator and scaler, but doesn't
+    import sklearn.
+    """
+
+    @staticmethod
+    def from_classifier(classifier: Classifier, feature_layout: [str] = None) -> "NumpyClassifier":
+        assert isinstance(classifier, (NeuralNetworkClassifier, LogisticRegressionClassifier)), \
+            f"Can't export a {type(classifier).__name__}, only MLP and logistic regression classifiers."
+
+        estimator = classifier.estimator
+        assert list(estimator.classes_) == [0, 1], f"Expected classes [0, 1], got {list(estimator.classes_)}."
+
+        if isinstance(classifier, NeuralNetworkClassifier):
+            assert estimator.out_activation_ == "logistic", "Only binary MLP classifiers can be exported."
+            weights, biases = list(estimator.coefs_), list(estimator.intercepts_)
+            activation = estimator.activation
+        else:
+            weights, biases = [estimator.coef_.T], [estimator.intercept_]
+            activation = "identity"
+
+        return NumpyClassifier(np.array(classifier.scaler.scale_, dtype=np.float64),
+                               np.array(classifier.scaler.min_, dtype=np.float64),
+                               [np.array(layer_weights, dtype=np.float64) for layer_weights in weights],
+                               [np.array(layer_biases, dtype=np.float64) for layer_biases in biases],
+                               activation, feature_layout)
+
+    def predict_proba(self, samples: [Sample]):
+        return self.predict_proba_features([sample.features for sample in samples])
+
+    def predict_proba_features(self, features) -> np.ndarray:
+        win_p = self.predict_win_p(np.asarray(features, dtype=np.float64))
+        return np.column_stack([1 - win_p, win_p])
+
+    """
+    Returns the win probabilities of team_1 (class 1) for a matrix of features, or a single feature vector.
+    """
+
+    def predict_win_p(self, features: np.ndarray) -> np.ndarray:
+        values = features * self.scale + self.offset
+        last_layer = len(self.weights) - 1
+        for idx, (layer_weights, layer_biases) in enumerate(zip(self.weights, self.biases)):
+            values = values @ layer_weights + layer_biases
+            if idx != last_layer:
+                values = self._hidden_activation(values)
+        return self._output_activation(values)[..., 0]
+
+    def save(self, path: str):
+        metadata = {
+            "format_version": FORMAT_VERSION,
+            "activation": self.activation,
+            "layers": len(self.weights),
+            "feature_layout": self.feature_layout,
+        }
+        arrays = {"scale": self.scale, "offset": self.offset}
+        for idx, (layer_weights, layer_biases) in enumerate(zip(self.weights, self.biases)):
+            arrays[f"weights_{idx}"] = layer_weights
+            arrays[f"biases_{idx}"] = layer_biases
+
+        # Plain arrays and a JSON string: loading never unpickles anything.
+        with open(path, 'wb') as f:
+            np.savez(f, metadata=np.array(json.dumps(metadata)), **arrays)
+
+    """
+    Loads an exported classifier. When an expected feature layout is given, refuses files exported from a
+    classifier fitted on a different layout.
+    """
+
+    @staticmethod
+    def load(path: str, feature_layout: [str] = None) -> "NumpyClassifier":
+        with np.load(path, allow_pickle=False) as content:
+            metadata = json.loads(str(content["metadata"]))
+            assert metadata["format_version"] == FORMAT_VERSION, \
+                f"{path} has format version {metadata['format_version']}, expected {FORMAT_VERSION}."
+
+            if feature_layout is not None and metadata["feature_layout"] is not None:
+                assert list(feature_layout) == metadata["feature_layout"], \
+                    f"{path} was exported with features {metadata['feature_layout']}, " \
+                    f"but the features to predict on are {list(feature_layout)}."
+
+            layers = range(metadata["layers"])
+            return NumpyClassifier(content["scale"], content["offset"],
+                                   [content[f"weights_{idx}"] for idx in layers],
+                                   [content[f"biases_{idx}"] for idx in layers],
+                                   metadata["activation"], metadata["feature_layout"])
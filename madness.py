@@ -0,0 +1,358 @@
+"""
+Headless command line entry point, an alternative to the Stage 1 notebook.
+
+Run from the repository root:
+    python -m madness seasons --gender M
+    python -m madness backtest --gender M --train-start 1985 --train-end 2015 --test-start 2016 --test-end 2021
+    python -m madness predict --gender M --train-end 2021 --test-start 2022 --test-end 2022 --output submission.csv
+    python -m madness submit --train-end 2021 --test-start 2022 --test-end 2022 --output submission.csv
+    python -m madness backtest --gender M --classifier LR --store experiments.sqlite
+    python -m madness experiments --store experiments.sqlite
+    python -m madness rescore submission.csv
+
+Heavy modules (sklearn) are only imported by the commands which train a model, so quick commands start fast.
+"""
+import argparse
+import logging
+import os
+import sys
+from typing import Dict
+
+from parser import Parser
+from profiler import profiler
+
+
+def _get_parser(args) -> Parser:
+    return Parser(args.gender, os.path.join(args.resources, ''))
+
+
+def _parse_seasons(args) -> Dict:
+    seasons, _ = _get_parser(args).parse()
+    return seasons
+
+
+def _get_train_start(args, seasons: Dict) -> int:
+    # Women's data starts later than men's data (1998 vs. 1985).
+    return max(args.train_start, min(seasons.keys()))
+
+
+def _create_spans(args):
+    from span import Span
+
+    seasons = _parse_seasons(args)
+    return Span.create_spans(seasons, _get_train_start(args, seasons), args.train_end, args.test_start,
+                             args.test_end, args.classifier)
+
+
+def _get_classifier(args, train_span, test_span):
+    # Exported NumPy classifiers load without sklearn.
+    if args.model and args.model.endswith(".npz"):
+        from inference import NumpyClassifier
+        return NumpyClassifier.load(args.model, test_span.feature_layout)
+    if args.model:
+        from artifact import ModelArtifact
+        return ModelArtifact.load(args.model, test_span.feature_layout).classifier
+    return train_span.train(args.max_iter)
+
+
+def _print_scores(scores: Dict):
+    for year, score in scores.items():
+        print(f"{year}\t{score:.5f}")
+
+
+def seasons_command(args):
+    for year in _get_parser(args).parse_seasons_years():
+        print(year)
+
+
+def parse_command(args):
+    seasons, teams = _get_parser(args).parse()
+    print(f"{len(teams)} teams, {len(seasons)} seasons")
+    for year, season in seasons.items():
+        print(f"{year}\t{len(season.regular_season.regular_season_games)} regular season games\t"
+              f"{len(season.tournament.tournament_games)} tournament games\t"
+              f"{len(season.tournament.team_ids)} seeded teams")
+
+
+def train_command(args):
+    from span import Span
+
+    # Only the train span is needed here: the test span options are ignored.
+    seasons = _parse_seasons(args)
+    train_start = _get_train_start(args, seasons)
+    train_span = Span([season for year, season in seasons.items() if train_start <= year <= args.train_end],
+                      classifier_type=args.classifier)
+    classifier = train_span.train(args.max_iter)
+    if args.save:
+        from artifact import ModelArtifact
+        ModelArtifact.from_span(train_span, classifier, args.max_iter).save(args.save)
+
+    # In-sample score, only meant as a sanity check of the fit.
+    _print_scores(Span.score(train_span.predict(train_span.build_seasons_classifiers_map(classifier))))
+    return classifier
+
+
+def backtest_command(args):
+    from span import Span
+
+    train_span, test_span = _create_spans(args)
+    if args.store and not args.model:
+        from experiments import ExperimentStore
+
+        # Runs already in the store are returned without training.
+        store = ExperimentStore(args.store)
+        run = store.run(train_span, test_span, args.max_iter, gender=args.gender)
+        store.close()
+        _print_scores(run["scores"])
+        return
+
+    classifier = _get_classifier(args, train_span, test_span)
+    _print_scores(Span.score(test_span.predict(test_span.build_seasons_classifiers_map(classifier))))
+
+
+def ablation_command(args):
+    from ablation import FeatureAblation
+
+    # Women's data has no rankings: the default candidates leave ranking features out.
+    absolute_features, relative_features = args.absolute_features, args.relative_features
+    if absolute_features is None:
+        absolute_features = [name for name in FeatureAblation.ABSOLUTE_FEATURES
+                             if args.gender == "M" or name not in FeatureAblation.RANKING_FEATURES]
+    if relative_features is None:
+        relative_features = [name for name in FeatureAblation.RELATIVE_FEATURES
+                             if args.gender == "M" or name not in FeatureAblation.RANKING_FEATURES]
+
+    train_span, test_span = _create_spans(args)
+    ablation = FeatureAblation(train_span, test_span, absolute_features, relative_features, args.classifier,
+                               args.max_iter)
+    print("Leave one out (score without the feature):")
+    _print_scores(ablation.leave_one_out())
+    print("Forward selection:")
+    for features, score in ablation.forward_selection():
+        print(f"{score:.5f}\t{','.join(features)}")
+    print("Permutation importance (score increase, mean and standard deviation):")
+    for name, (mean, std) in ablation.permutation_importance().items():
+        print(f"{name}\t{mean:.5f}\t{std:.5f}")
+
+
+def grid_command(args):
+    from grid import PredictionGrid
+
+    seasons = _parse_seasons(args)
+    train_start = _get_train_start(args, seasons)
+    # Seasons without tournament games (2020, or the season to predict) don't bring any training data.
+    classifier = PredictionGrid.train([season for year, season in seasons.items() if train_start <= year <=
+                                       args.train_end and season and season.tournament.tournament_games],
+                                      args.classifier, args.max_iter)
+
+    os.makedirs(args.output, exist_ok=True)
+    for year in range(args.test_start, args.test_end + 1):
+        if not seasons.get(year):
+            continue
+        path = os.path.join(args.output, f"{args.gender}_grid_{year}.npy")
+        matrix = PredictionGrid(seasons[year]).write(classifier, path, args.chunk_size)
+        print(f"Wrote {len(matrix)} x {len(matrix)} probabilities to {path}")
+
+
+def experiments_command(args):
+    from experiments import ExperimentStore
+
+    store = ExperimentStore(args.store)
+    for run in store.query(args.classifier, limit=args.limit):
+        config = run["config"]
+        print(f"{run['key'][:12]}\t{run['scores']['Average']:.5f}\t{config['classifier_type']}\t"
+              f"max_iter={config['max_iter']}\ttrain={config['train_years'][0]}-{config['train_years'][-1]}\t"
+              f"test={config['test_years'][0]}-{config['test_years'][-1]}\t{run['train_time']:.1f}s\t"
+              f"{','.join(run['feature_layout'])}")
+    store.close()
+
+
+def predict_command(args):
+    from pipeline import Pipeline
+
+    train_span, test_span = _create_spans(args)
+    classifier = _get_classifier(args, train_span, test_span)
+    span_predictions = test_span.predict(test_span.build_seasons_classifiers_map(classifier))
+
+    lines = ["ID,Pred"] + Pipeline.get_submission_lines(span_predictions)
+    Pipeline.write_submission(lines, args.output)
+    print(f"Wrote {len(lines) - 1} predictions to {args.output}")
+
+
+def submit_command(args):
+    from pipeline import Pipeline
+
+    pipeline = Pipeline(args.train_start, args.train_end, args.test_start, args.test_end, args.classifier,
+                        args.max_iter, args.genders, os.path.join(args.resources, ''))
+    lines = pipeline.run(args.output)
+    print(f"Wrote {len(lines) - 1} predictions to {args.output}")
+
+
+def export_command(args):
+    from artifact import ModelArtifact
+    from inference import NumpyClassifier
+
+    artifact = ModelArtifact.load(args.artifact)
+    NumpyClassifier.from_classifier(artifact.classifier, artifact.feature_layout).save(args.output)
+    print(f"Exported {args.artifact} to {args.output}")
+
+
+def serve_command(args):
+    import asyncio
+    from service import PredictionServer, PredictionService
+
+    seasons = _parse_seasons(args)
+    # No span to train on: the model comes from an artifact, checked against the seasons' feature layout.
+    any_season = next(season for season in seasons.values() if season)
+    classifier = _get_classifier(args, None, any_season)
+
+    service = PredictionService(seasons, classifier, args.years, args.batch_window / 1000)
+    asyncio.run(PredictionServer(service, args.host, args.port).serve())
+
+
+def rescore_command(args):
+    from sample import Sample
+    from span import Span
+
+    # Expected outcomes keyed by "<year>_<team_1_id>_<team_2_id>", for both genders (team IDs don't overlap).
+    expected_outcomes: Dict[str, int] = {}
+    for gender in args.genders:
+        tournaments_games = Parser(gender, os.path.join(args.resources, '')).parse_tournaments_games()
+        for year, games in tournaments_games.items():
+            for game in games:
+                expected_outcomes[f"{year}_{game}"] = game.outcome()
+
+    span_predictions: Dict = {}
+    with open(args.submission) as submission:
+        next(submission)
+        for line in submission:
+            match_up_id, win_p = line.strip().split(',')
+            year, team_1_id, team_2_id = (int(value) for value in match_up_id.split('_'))
+
+            sample = Sample(team_1_id, team_2_id, [], expected_outcomes.get(match_up_id, -1))
+            sample.win_p = float(win_p)
+            span_predictions.setdefault(year, []).append(sample)
+
+    _print_scores(Span.score(span_predictions))
+
+
+def _build_arguments_parser() -> argparse.ArgumentParser:
+    common = argparse.ArgumentParser(add_help=False)
+    common.add_argument("--resources", default="resources", help="Directory of the Kaggle CSV files.")
+    common.add_argument("--verbose", action="store_true", help="Log progress at INFO level.")
+    common.add_argument("--profile", metavar="PREFIX",
+                        help="Record stage timings to PREFIX.json and PREFIX.folded (flame graph input).")
+    common.add_argument("--profile-memory", action="store_true", help="Also record peak memory when profiling.")
+
+    gender = argparse.ArgumentParser(add_help=False)
+    gender.add_argument("--gender", default="M", choices=["M", "W"])
+
+    genders = argparse.ArgumentParser(add_help=False)
+    genders.add_argument("--genders", nargs="+", default=["M", "W"], choices=["M", "W"])
+
+    # Mirrors the Span.create_spans options.
+    spans = argparse.ArgumentParser(add_help=False)
+    spans.add_argument("--train-start", type=int, default=1985)
+    spans.add_argument("--train-end", type=int, default=2015)
+    spans.add_argument("--test-start", type=int, default=2016)
+    spans.add_argument("--test-end", type=int, default=2021)
+    spans.add_argument("--classifier", default="MLP", choices=["MLP", "LR", "GB"])
+    spans.add_argument("--max-iter", type=int, default=1000)
+
+    arguments_parser = argparse.ArgumentParser(prog="madness", description="March madness predictions.")
+    commands = arguments_parser.add_subparsers(dest="command", required=True)
+
+    command = commands.add_parser("seasons", parents=[common, gender], help="List the available seasons.")
+    command.set_defaults(function=seasons_command)
+
+    command = commands.add_parser("parse", parents=[common, gender], help="Parse the data and summarize it.")
+    command.set_defaults(function=parse_command)
+
+    command = commands.add_parser("train", parents=[common, gender, spans],
+                                  help="Train a classifier on the train span.")
+    command.add_argument("--save", metavar="PATH", help="Save the fitted classifier as a model artifact.")
+    command.set_defaults(function=train_command)
+
+    command = commands.add_parser("backtest", parents=[common, gender, spans],
+                                  help="Train on the train span and score the test span.")
+    command.add_argument("--model", metavar="PATH", help="Load a model artifact (or .npz export) instead of training.")
+    command.add_argument("--store", metavar="PATH",
+                         help="Experiment store (SQLite): reuse the stored run if any, otherwise store this one.")
+    command.set_defaults(function=backtest_command)
+
+    command = commands.add_parser("predict", parents=[common, gender, spans],
+                                  help="Train on the train span and write predictions for the test span.")
+    command.add_argument("--output", default="submission.csv")
+    command.add_argument("--model", metavar="PATH", help="Load a model artifact (or .npz export) instead of training.")
+    command.set_defaults(function=predict_command)
+
+    command = commands.add_parser("submit", parents=[common, genders, spans],
+                                  help="Run both genders concurrently and write one merged submission.")
+    command.add_argument("--output", default="submission.csv")
+    command.set_defaults(function=submit_command)
+
+    command = commands.add_parser("export", parents=[common],
+                                  help="Export an MLP or LR model artifact to a NumPy-only .npz classifier.")
+    command.add_argument("artifact")
+    command.add_argument("output")
+    command.set_defaults(function=export_command)
+
+    command = commands.add_parser("serve", parents=[common, gender],
+                                  help="Serve year/team-pair win probabilities over HTTP from a model artifact.")
+    command.add_argument("--model", metavar="PATH", required=True, help="Model artifact (or .npz export).")
+    command.add_argument("--years", nargs="+", type=int, default=[],
+                         help="Seasons whose probability matrices are precomputed at startup.")
+    command.add_argument("--host", default="127.0.0.1")
+    command.add_argument("--port", type=int, default=8080)
+    command.add_argument("--batch-window", type=float, default=2, help="Micro-batch window, in milliseconds.")
+    command.set_defaults(function=serve_command)
+
+    command = commands.add_parser("ablation", parents=[common, gender, spans],
+                                  help="Feature ablation: leave one out, forward selection, permutation importance.")
+    command.add_argument("--absolute-features", nargs="+",
+                         help="Candidate features, FeatureAblation.ABSOLUTE_FEATURES by default (without rankings "
+                              "for W).")
+    command.add_argument("--relative-features", nargs="*",
+                         help="Candidate features, FeatureAblation.RELATIVE_FEATURES by default (without "
+                              "ranking_diff for W).")
+    command.set_defaults(function=ablation_command)
+
+    command = commands.add_parser("grid", parents=[common, gender, spans],
+                                  help="Write float32 win probability matrices of all division 1 teams.")
+    command.add_argument("--output", default="grids", help="Directory of the <gender>_grid_<year>.npy files.")
+    command.add_argument("--chunk-size", type=int, default=65536, help="Pairs predicted per batch.")
+    command.set_defaults(function=grid_command)
+
+    command = commands.add_parser("experiments", parents=[common],
+                                  help="List the runs of an experiment store, best average score first.")
+    command.add_argument("--store", metavar="PATH", default="experiments.sqlite")
+    command.add_argument("--classifier", choices=["MLP", "LR", "GB"], help="Only list runs of that classifier.")
+    command.add_argument("--limit", type=int)
+    command.set_defaults(function=experiments_command)
+
+    command = commands.add_parser("rescore", parents=[common, genders],
+                                  help="Score a submission file against the actual tournament results.")
+    command.add_argument("submission")
+    command.set_defaults(function=rescore_command)
+
+    return arguments_parser
+
+
+def main(argv: [str] = None):
+    args = _build_arguments_parser().parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO if args.verbose else logging.WARNING, stream=sys.stdout,
+                        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s')
+
+    if args.profile:
+        profiler.enable(memory=args.profile_memory)
+
+    args.function(args)
+
+    if args.profile:
+        profiler.export_json(args.profile + ".json")
+        profiler.export_folded(args.profile + ".folded")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+import numpy as np
+
+from game import Game
+from teams import TeamRegistry
+
+
+class CommonOpponents:
+    """
+    Compares two teams through the opponents they both faced during the regular season, which says something about
+    match-ups of teams which never played each other.
+
+    The season's games are laid out as sparse team x team matrices, indexed by the team registry: the number of
+    games played and the average margin of the row team against the column team. For every pair of the given teams
+    (usually the tournament teams), matrix products then give, all at once:
+    - counts[a, b]: number of common opponents of a and b;
+    - margins[a, b]: the transitive margin of a over b through their common opponents, i.e. the average over
+      common opponents o of (a's average margin against o) - (b's average margin against o).
+
+    Teams without common opponents get a margin of 0.
+    """
+
+    def __init__(self, games: [Game], teams: TeamRegistry, team_ids: [int]):
+        # scipy is only needed here: import it on first use, like sklearn.
+        from scipy.sparse import coo_matrix
+
+        number_teams = len(teams)
+        w_idx = teams.indices([game.w_team_id for game in games])
+        l_idx = teams.indices([game.l_team_id for game in games])
+        margins = np.array([game.w_score - game.l_score for game in games], dtype=float)
+
+        # Both points of view of each game. Duplicate entries (teams playing each other several times) are summed.
+        rows, columns = np.concatenate([w_idx, l_idx]), np.concatenate([l_idx, w_idx])
+        shape = (number_teams, number_teams)
+        played = coo_matrix((np.ones(len(rows)), (rows, columns)), shape=shape).tocsr()
+        total_margins = coo_matrix((np.concatenate([margins, -1 * margins]), (rows, columns)), shape=shape).tocsr()
+        average_margins = total_margins.multiply(played.power(-1)).tocsr()
+
+        self.team_ids: np.ndarray = np.array(sorted(team_ids), dtype=np.int64)
+        indices = teams.indices(self.team_ids)
+        faced = (played[indices] > 0).astype(float)
+
+        self.counts: np.ndarray = (faced @ faced.T).toarray()
+
+        # sums[a, b] = sum over the opponents o of b of a's average margin against o: only common opponents
+        # contribute, as a's average margin against teams it didn't face is 0.
+        sums = (average_margins[indices] @ faced.T).toarray()
+        self.margins: np.ndarray = np.where(self.counts > 0, (sums - sums.T) / np.maximum(self.counts, 1), 0)
+
+    """
+    Positions of both teams in team_ids. Raises a KeyError on teams which aren't part of the compared teams, instead
+    of silently using a neighbour's row.
+    """
+
+    def _indices(self, team_1_id: int, team_2_id: int):
+        team_ids = np.array([team_1_id, team_2_id], dtype=np.int64)
+        positions = np.minimum(np.searchsorted(self.team_ids, team_ids), len(self.team_ids) - 1)
+        unknown = self.team_ids[positions] != team_ids
+        if unknown.any():
+            raise KeyError(f"Unknown team IDs: {np.unique(team_ids[unknown]).tolist()}")
+        return positions[0], positions[1]
+
+    def get_count(self, team_1_id: int, team_2_id: int) -> float:
+        return self.counts[self._indices(team_1_id, team_2_id)]
+
+    def get_margin(self, team_1_id: int, team_2_id: int) -> float:
+        return self.margins[self._indices(team_1_id, team_2_id)]
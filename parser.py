@@ -3,14 +3,15 @@ from collections import defaultdict
 from typing import Dict
 
 from game import Game
+from profiler import profiler
 from season import Season
-from teams import Team
+from teams import Team, TeamRegistry
 from seed import Seed
 
 
 class Parser:
-    def __init__(self, gender: str = "W"):
-        self.path = 'resources/'
+    def __init__(self, gender: str = "W", path: str = 'resources/'):
+        self.path = path
         self.gender = gender
         self.logger = self._get_logger()
 
@@ -18,8 +19,9 @@ class Parser:
     def _get_logger():
         return logging.getLogger(__name__)
 
+    @profiler.profiled("parse")
     def parse(self):
-        teams = self.parse_teams()
+        teams = TeamRegistry(self.parse_teams())
         regular_seasons_games = self.parse_regular_seasons_games()
         # print(regular_seasons_games[2022])
         tournaments_games = self.parse_tournaments_games()
@@ -31,6 +33,7 @@ class Parser:
         seasons = self.parse_seasons(regular_seasons_games, tournaments_games, teams, seasons_seeds, seasons_rankings)
         return seasons, teams
 
+    @profiler.profiled("parse_rankings")
     def parse_rankings(self) -> Dict:
         seasons_rankings: Dict = {}
         with open(self.path + self.gender + 'MasseyOrdinals.csv') as rankings_csv:
@@ -56,9 +59,11 @@ class Parser:
 
                         seasons_rankings[year][system_name][team_id] = rank
                 line_count += 1
+            profiler.count(line_count - 1)
             self.logger.info(f'Processed {line_count - 1} ranking rows.')
         return seasons_rankings
 
+    @profiler.profiled("parse_seeds")
     def parse_seeds(self) -> Dict:
         seasons_seeds: Dict = {}
         with open(self.path + self.gender + 'NCAATourneySeeds.csv') as seeds_csv:
@@ -75,9 +80,11 @@ class Parser:
                         seasons_seeds[year] = []
                     seasons_seeds[year].append(Seed(year, seed, team_id))
                 line_count += 1
+            profiler.count(line_count - 1)
             self.logger.info(f'Processed {line_count - 1} seeds.')
         return seasons_seeds
 
+    @profiler.profiled("parse_teams")
     def parse_teams(self) -> [Team]:
         teams: [Team] = []
         with open(self.path + self.gender + 'Teams.csv') as teams_csv:
@@ -96,10 +103,22 @@ class Parser:
                         last_d1_season: int = int(row[3])
                     teams.append(Team(team_id, team_name, first_d1_season, last_d1_season))
                 line_count += 1
+            profiler.count(line_count - 1)
             self.logger.info(f'Processed {line_count - 1} teams.')
         return teams
 
-    def parse_seasons(self, regular_seasons_games: Dict, tournaments_games: Dict, teams: [Team],
+    """
+    Returns the years listed in the seasons file, without parsing any game. Cheap enough for quick listings.
+    """
+
+    def parse_seasons_years(self) -> [int]:
+        with open(self.path + self.gender + 'Seasons.csv') as seasons_csv:
+            csv_reader = csv.reader(seasons_csv, delimiter=',')
+            next(csv_reader)
+            return [int(row[0]) for row in csv_reader]
+
+    @profiler.profiled("parse_seasons")
+    def parse_seasons(self, regular_seasons_games: Dict, tournaments_games: Dict, teams: TeamRegistry,
                       seasons_seeds: Dict, seasons_rankings: Dict):
         seasons: Dict[int, Season] = {}
         with open(self.path + self.gender + 'Seasons.csv') as seasons_csv:
@@ -145,9 +164,11 @@ class Parser:
                                                tournament_games, region_w, region_x, region_y, region_z, seeds,
                                                teams)
                 line_count += 1
+            profiler.count(line_count - 1)
             self.logger.info(f'Processed {line_count - 1} seasons.')
         return seasons
 
+    @profiler.profiled("parse_regular_seasons_games")
     def parse_regular_seasons_games(self):
         games: Dict = {}
         with open(self.path + self.gender + 'RegularSeasonCompactResults.csv') as seasons_csv:
@@ -202,9 +223,11 @@ class Parser:
                              w_ftm, w_fta, w_or, w_dr, w_ast, w_to, w_stl, w_blk, w_pf, l_fgm, l_fga, l_fgm3, l_fga3,
                              l_ftm, l_fta, l_or, l_dr, l_ast, l_to, l_stl, l_blk, l_pf"""
                 line_count += 1
+            profiler.count(line_count - 1)
             self.logger.info(f'Processed {line_count - 1} games.')
         return games
 
+    @profiler.profiled("parse_tournaments_games")
     def parse_tournaments_games(self):
         games: Dict = {}
         with open(self.path + self.gender +  'NCAATourneyCompactResults.csv') as seasons_csv:
@@ -259,5 +282,6 @@ class Parser:
                              w_ftm, w_fta, w_or, w_dr, w_ast, w_to, w_stl, w_blk, w_pf, l_fgm, l_fga, l_fgm3, l_fga3,
                              l_ftm, l_fta, l_or, l_dr, l_ast, l_to, l_stl, l_blk, l_pf"""
                 line_count += 1
+            profiler.count(line_count - 1)
             self.logger.info(f'Processed {line_count - 1} games.')
         return games
@@ -0,0 +1,93 @@
+import logging
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict
+
+from parser import Parser
+from span import Span
+
+
+class Pipeline:
+    """
+    Runs the whole parse -> seasons -> train -> predict chain end to end for both men's and women's data, and
+    merges the predictions into a single submission.
+
+    Each gender runs in its own worker process, so the wall-clock time of a full run is roughly that of the slower
+    gender instead of the sum of both. The gender differences (no rankings and no division 1 season columns for
+    women) are handled by the Parser itself.
+
+    E.g. Stage 2: train on 1985-2021 and predict 2022.
+         Pipeline(1985, 2021, 2022, 2022).run("submission.csv")
+    """
+
+    def __init__(self, train_start: int, train_end: int, predict_start: int, predict_end: int,
+                 classifier_type: str = "MLP", max_iter: int = 1000, genders: [str] = ("M", "W"),
+                 path: str = 'resources/'):
+        self.train_start: int = train_start
+        self.train_end: int = train_end
+        self.predict_start: int = predict_start
+        self.predict_end: int = predict_end
+        self.classifier_type: str = classifier_type
+        self.max_iter: int = max_iter
+        self.genders: [str] = list(genders)
+        self.path: str = path
+        self.logger = self._get_logger()
+
+    @staticmethod
+    def _get_logger():
+        return logging.getLogger(__name__)
+
+    """
+    Runs every gender concurrently and returns the merged submission lines (header included). Writes them to the
+    provided path if any.
+    """
+
+    def run(self, path: str = None) -> [str]:
+        with ProcessPoolExecutor(max_workers=len(self.genders)) as executor:
+            futures = {gender: executor.submit(self.run_gender, gender) for gender in self.genders}
+            genders_lines: Dict[str, [str]] = {gender: future.result() for gender, future in futures.items()}
+
+        lines = ["ID,Pred"]
+        for gender in self.genders:
+            self.logger.info(f'{len(genders_lines[gender])} predictions for gender {gender}.')
+            lines.extend(genders_lines[gender])
+
+        if path is not None:
+            Pipeline.write_submission(lines, path)
+        return lines
+
+    """
+    Runs the pipeline for a single gender. Executed in a worker process: only the submission lines travel back to
+    the parent process, not the seasons.
+    """
+
+    def run_gender(self, gender: str) -> [str]:
+        seasons, _ = Parser(gender, self.path).parse()
+
+        # Women's data starts later than men's data (1998 vs. 1985).
+        train_start = max(self.train_start, min(seasons.keys()))
+
+        train_span, predict_span = Span.create_spans(seasons, train_start, self.train_end, self.predict_start,
+                                                     self.predict_end, self.classifier_type)
+        classifier = train_span.train(self.max_iter)
+        span_predictions = predict_span.predict(predict_span.build_seasons_classifiers_map(classifier))
+
+        return Pipeline.get_submission_lines(span_predictions)
+
+    """
+    Formats span predictions into submission lines: "<year>_<team_1_id>_<team_2_id>,<win_p>".
+    """
+
+    @staticmethod
+    def get_submission_lines(span_predictions: Dict) -> [str]:
+        lines = []
+        for year, season_predictions in span_predictions.items():
+            for prediction in season_predictions:
+                lines.append(f"{year}_{prediction.team_1_id}_{prediction.team_2_id},{prediction.win_p}")
+        return lines
+
+    @staticmethod
+    def write_submission(lines: [str], path: str):
+        with open(path, 'w') as f:
+            for line in lines:
+                f.write(line)
+                f.write('\n')
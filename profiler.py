@@ -0,0 +1,205 @@
+import functools
+import json
+import time
+import tracemalloc
+from collections import defaultdict
+from contextlib import contextmanager
+from typing import Dict, Optional
+
+
+class StageRecord:
+    """
+    Measurements of a single execution of an instrumented stage:
+    - wall time and CPU time, in seconds;
+    - peak traced memory during the stage, in bytes (only when memory tracking is enabled);
+    - number of items processed (rows parsed, games, samples, etc.), if the stage reports any.
+
+    The path is the list of labels of the enclosing stages, from the outermost to this one.
+    """
+
+    def __init__(self, name: str, parent_path: [str], tags: Dict):
+        self.name: str = name
+        self.tags: Dict = tags
+        self.path: [str] = parent_path + [self.label]
+        self.wall_time: float = 0
+        self.cpu_time: float = 0
+        self.peak_memory: Optional[int] = None
+        self.items: int = 0
+
+        # Wall time spent in nested stages, used to compute the self time of flame graph frames.
+        self.children_wall_time: float = 0
+
+    @property
+    def label(self) -> str:
+        if not self.tags:
+            return self.name
+        tags = ",".join(f"{key}={value}" for key, value in self.tags.items())
+        return f"{self.name}[{tags}]"
+
+    @property
+    def self_time(self) -> float:
+        return max(self.wall_time - self.children_wall_time, 0)
+
+    def to_dict(self) -> Dict:
+        return {
+            "name": self.name,
+            "path": self.path,
+            "tags": self.tags,
+            "wall_time": self.wall_time,
+            "cpu_time": self.cpu_time,
+            "peak_memory": self.peak_memory,
+            "items": self.items,
+        }
+
+
+class Profiler:
+    """
+    Opt-in instrumentation of the pipeline stages (parsing, seasons construction, training, predicting, scoring).
+
+    Stages are recorded through the stage context manager or the profiled decorator. Both are no-ops until the
+    profiler is enabled, so instrumented code pays close to nothing by default.
+
+    E.g. profiler.enable(memory=True)
+         seasons, teams = Parser("M").parse()
+         profiler.export_json("profile.json")
+         profiler.export_folded("profile.folded")  # Input for flamegraph.pl or speedscope.
+
+    Memory tracking relies on tracemalloc, which slows down allocations significantly: it is disabled by default
+    even when the profiler is enabled.
+    """
+
+    def __init__(self):
+        self.enabled: bool = False
+        self.memory: bool = False
+        self.records: [StageRecord] = []
+        self._stack: [StageRecord] = []
+        self._peaks: [int] = []
+
+    def enable(self, memory: bool = False):
+        self.enabled = True
+        self.memory = memory
+        if memory and not tracemalloc.is_tracing():
+            tracemalloc.start()
+
+    def disable(self):
+        self.enabled = False
+        if self.memory and tracemalloc.is_tracing():
+            tracemalloc.stop()
+        self.memory = False
+
+    def reset(self):
+        self.records = []
+        self._stack = []
+        self._peaks = []
+
+    @contextmanager
+    def stage(self, name: str, **tags):
+        if not self.enabled:
+            yield None
+            return
+
+        record = StageRecord(name, self._stack[-1].path if self._stack else [], tags)
+        if self.memory:
+            # Fold the peak reached so far into the enclosing stage before resetting it for this one.
+            peak = self._reset_peak()
+            if self._peaks:
+                self._peaks[-1] = max(self._peaks[-1], peak)
+            self._peaks.append(0)
+        self._stack.append(record)
+
+        wall_start, cpu_start = time.perf_counter(), time.process_time()
+        try:
+            yield record
+        finally:
+            record.wall_time = time.perf_counter() - wall_start
+            record.cpu_time = time.process_time() - cpu_start
+            self._stack.pop()
+
+            if self.memory:
+                record.peak_memory = max(self._peaks.pop(), self._reset_peak())
+                if self._peaks:
+                    self._peaks[-1] = max(self._peaks[-1], record.peak_memory)
+
+            if self._stack:
+                self._stack[-1].children_wall_time += record.wall_time
+            self.records.append(record)
+
+    """
+    Returns the peak traced memory since the last reset, then resets it. On Python < 3.9, tracemalloc can't reset
+    its peak: we report the peak since tracing started instead.
+    """
+
+    @staticmethod
+    def _reset_peak() -> int:
+        _, peak = tracemalloc.get_traced_memory()
+        if hasattr(tracemalloc, "reset_peak"):
+            tracemalloc.reset_peak()
+        return peak
+
+    """
+    Adds a number of processed items to the innermost running stage.
+    """
+
+    def count(self, items: int):
+        if self.enabled and self._stack:
+            self._stack[-1].items += items
+
+    def profiled(self, name: str = None):
+        def decorator(function):
+            stage_name = name or function.__qualname__
+
+            @functools.wraps(function)
+            def wrapper(*args, **kwargs):
+                if not self.enabled:
+                    return function(*args, **kwargs)
+                with self.stage(stage_name):
+                    return function(*args, **kwargs)
+
+            return wrapper
+
+        return decorator
+
+    """
+    Aggregates records by stage name: number of calls, total wall time, total CPU time, maximum peak memory and
+    total items.
+    """
+
+    def summary(self) -> Dict[str, Dict]:
+        summary: Dict[str, Dict] = defaultdict(lambda: {"calls": 0, "wall_time": 0, "cpu_time": 0,
+                                                        "peak_memory": None, "items": 0})
+        for record in self.records:
+            stage_summary = summary[record.name]
+            stage_summary["calls"] += 1
+            stage_summary["wall_time"] += record.wall_time
+            stage_summary["cpu_time"] += record.cpu_time
+            stage_summary["items"] += record.items
+            if record.peak_memory is not None:
+                stage_summary["peak_memory"] = max(stage_summary["peak_memory"] or 0, record.peak_memory)
+        return dict(summary)
+
+    def to_json(self) -> str:
+        return json.dumps({"stages": [record.to_dict() for record in self.records], "summary": self.summary()},
+                          indent=2)
+
+    def export_json(self, path: str):
+        with open(path, 'w') as f:
+            f.write(self.to_json())
+
+    """
+    Returns the profile in the folded stacks format ("outer;inner;innermost <value>" per line), understood by
+    flamegraph.pl, speedscope and most flame graph tools. Values are self times in microseconds.
+    """
+
+    def to_folded(self) -> str:
+        folded: Dict[str, int] = defaultdict(lambda: 0)
+        for record in self.records:
+            folded[";".join(record.path)] += int(record.self_time * 1e6)
+        return "\n".join(f"{stack} {value}" for stack, value in folded.items()) + "\n"
+
+    def export_folded(self, path: str):
+        with open(path, 'w') as f:
+            f.write(self.to_folded())
+
+
+# Process-wide profiler used by the instrumented pipeline stages.
+profiler = Profiler()
@@ -0,0 +1,135 @@
+"""
+Scaling report: runs the pipeline on generated fixtures of growing sizes and shows where parsing, season
+construction and prediction stop scaling linearly.
+
+Run from the repository root:
+    python -m scaling --scales 1 10 100 --output scaling.json
+
+A scale multiplies the volume of data (games, rankings) of the base fixtures. Teams and seasons each grow by the
+square root of the scale, so regular season games grow linearly with it, while the number of all-pairs
+predictions (64 seeded teams per season) only grows with the number of seasons.
+"""
+import argparse
+import json
+import math
+import sys
+import tempfile
+import warnings
+from typing import Dict
+
+from classifier import FiftyFiftyClassifier
+from fixtures import FixtureGenerator
+from parser import Parser
+from profiler import profiler
+from span import Span
+
+# Stages reported, as recorded by the profiler.
+STAGES = ["parse_regular_seasons_games", "parse_tournaments_games", "parse_seeds", "parse_rankings",
+          "parse_seasons", "regular_season", "span.train", "season.predict", "span.score"]
+
+
+def get_generator(scale: float, base_teams: int, base_seasons: int, games_per_team: int, ranking_days: [int],
+                  seed: int) -> FixtureGenerator:
+    factor = math.sqrt(scale)
+    return FixtureGenerator(number_teams=max(round(base_teams * factor), 64), first_season=1985,
+                            number_seasons=max(round(base_seasons * factor), 3), games_per_team=games_per_team,
+                            seed=seed, ranking_days=ranking_days)
+
+
+"""
+Runs parse -> train -> predict -> score at a single scale and returns the profiler summary of each stage.
+"""
+
+
+def run_scale(generator: FixtureGenerator, classifier_type: str, max_iter: int) -> Dict[str, Dict]:
+    with tempfile.TemporaryDirectory() as path:
+        generator.write(path, "M")
+
+        profiler.reset()
+        profiler.enable()
+        try:
+            seasons, _ = Parser("M", path + "/").parse()
+            years = sorted(year for year, season in seasons.items() if season)
+            train_span, test_span = Span.create_spans(seasons, years[0], years[-3], years[-2], years[-1],
+                                                      classifier_type)
+            classifier = train_span.train(max_iter)
+            Span.score(test_span.predict(test_span.build_seasons_classifiers_map(classifier)))
+
+            # All-pairs predictions over every season, the prediction cost independent of the classifier.
+            Span([seasons[year] for year in years]).predict({year: FiftyFiftyClassifier() for year in years})
+        finally:
+            profiler.disable()
+
+    return profiler.summary()
+
+
+def build_report(scales: [float], base_teams: int, base_seasons: int, games_per_team: int, ranking_days: [int],
+                 classifier_type: str, max_iter: int, seed: int) -> Dict:
+    report = {"scales": []}
+    for scale in scales:
+        generator = get_generator(scale, base_teams, base_seasons, games_per_team, ranking_days, seed)
+        print(f"Scale {scale}x: {generator.number_teams} teams, {generator.number_seasons} seasons", file=sys.stderr)
+        summary = run_scale(generator, classifier_type, max_iter)
+        report["scales"].append({
+            "scale": scale,
+            "teams": generator.number_teams,
+            "seasons": generator.number_seasons,
+            "stages": {stage: summary[stage] for stage in STAGES if stage in summary},
+        })
+    return report
+
+
+"""
+Prints, for each stage, the wall time at every scale and the time per item relative to the smallest scale: a stage
+scales linearly in its items as long as that ratio stays close to 1.
+"""
+
+
+def print_report(report: Dict):
+    scales = report["scales"]
+    header = "".join(f"{scale['scale']:>10g}x" for scale in scales)
+    print(f"{'stage':<30}{header}   (seconds, then per-item cost vs. {scales[0]['scale']:g}x)")
+
+    for stage in STAGES:
+        runs = [scale["stages"].get(stage) for scale in scales]
+        if runs[0] is None:
+            continue
+        times = "".join(f"{run['wall_time']:>11.3f}" if run else f"{'-':>11}" for run in runs)
+
+        ratios = ""
+        if runs[0]["items"]:
+            base_cost = runs[0]["wall_time"] / runs[0]["items"]
+            ratios = "".join(f"{run['wall_time'] / run['items'] / base_cost:>8.2f}" if run and run["items"]
+                             else f"{'-':>8}" for run in runs)
+        print(f"{stage:<30}{times}   {ratios}")
+
+
+def main(argv: [str] = None):
+    arguments_parser = argparse.ArgumentParser(prog="scaling", description="Pipeline scaling report.")
+    arguments_parser.add_argument("--scales", nargs="+", type=float, default=[1, 10, 100])
+    arguments_parser.add_argument("--teams", type=int, default=120, help="Number of teams at scale 1.")
+    arguments_parser.add_argument("--seasons", type=int, default=6, help="Number of seasons at scale 1.")
+    arguments_parser.add_argument("--games-per-team", type=int, default=25)
+    arguments_parser.add_argument("--ranking-days", nargs="+", type=int, default=[133])
+    arguments_parser.add_argument("--classifier", default="LR", choices=["MLP", "LR", "GB"])
+    arguments_parser.add_argument("--max-iter", type=int, default=200)
+    arguments_parser.add_argument("--seed", type=int, default=0)
+    arguments_parser.add_argument("--output", help="JSON file to write the report to.")
+    args = arguments_parser.parse_args(argv)
+
+    warnings.filterwarnings("ignore", message="Stochastic Optimizer")
+
+    # Span.train imports sklearn lazily: import it now so the first scale's timings don't include it.
+    import sklearn.ensemble, sklearn.linear_model, sklearn.neural_network, sklearn.preprocessing  # noqa: F401
+
+    report = build_report(args.scales, args.teams, args.seasons, args.games_per_team, args.ranking_days,
+                          args.classifier, args.max_iter, args.seed)
+    print_report(report)
+
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
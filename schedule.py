@@ -0,0 +1,56 @@
+import numpy as np
+
+from game import Game
+from teams import TeamRegistry
+
+
+class TeamGamesIndex:
+    """
+    Compact, CSR-style index from teams to the games they played, built once per season.
+
+    Each game appears once for each of its two teams, as an entry. Entries are sorted by team (registry index),
+    then day number, so that team t's entries are the contiguous range offsets[t] to offsets[t + 1] (excluded).
+    Each entry stores the position of the game in the season's game list, the opponent's registry index, the day
+    number and whether the team won.
+
+    Any per-team query (record, schedule, opponents, head-to-head) slices that range: it costs the number of games
+    played by the team, instead of a scan of the whole season.
+    """
+
+    def __init__(self, games: [Game], teams: TeamRegistry):
+        self.teams: TeamRegistry = teams
+
+        w_idx = teams.indices([game.w_team_id for game in games])
+        l_idx = teams.indices([game.l_team_id for game in games])
+        days = np.array([game.day_num for game in games], dtype=np.int64)
+        positions = np.arange(len(games))
+
+        # Winners' entries first, then losers'. Ties on the day are broken by position in the game list.
+        entries_team = np.concatenate([w_idx, l_idx])
+        entries_position = np.concatenate([positions, positions])
+        self.order: np.ndarray = np.lexsort((entries_position, np.concatenate([days, days]), entries_team))
+
+        self.positions: np.ndarray = entries_position[self.order]
+        self.opponents: np.ndarray = np.concatenate([l_idx, w_idx])[self.order]
+        self.days: np.ndarray = np.concatenate([days, days])[self.order]
+        self.won: np.ndarray = (np.arange(2 * len(games)) < len(games))[self.order]
+
+        counts = np.bincount(entries_team, minlength=len(teams))
+        self.offsets: np.ndarray = np.concatenate([[0], np.cumsum(counts)])
+
+    """
+    Returns the range of entries of a team.
+    """
+
+    def get_slice(self, team_id: int) -> slice:
+        team_idx = self.teams.index(team_id)
+        return slice(self.offsets[team_idx], self.offsets[team_idx + 1])
+
+    """
+    Sorts the values of a per-game array into entries order: each game's value appears once for each team, negated
+    for the losing team if negate_for_losers.
+    """
+
+    def get_entries_values(self, games_values: np.ndarray, negate_for_losers: bool = False) -> np.ndarray:
+        values = games_values[self.positions]
+        return np.where(self.won, values, -1 * values) if negate_for_losers else values
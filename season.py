@@ -1,15 +1,21 @@
-from typing import Dict
+from typing import Callable, Dict
 
+import numpy as np
+
+from bracket import LiveBracket
 from feature import AbsoluteFeature, RelativeFeature, Feature
+from form import RecentForm
+from opponents import CommonOpponents
+from schedule import TeamGamesIndex
 from game import Game
-from classifier import Classifier, SeedsBasedClassifier
+from profiler import profiler
+from classifier import Classifier, RatingDifferenceClassifier, SeedsBasedClassifier, SeedsLogisticClassifier, \
+    TeamValuesClassifier
 from sample import Sample
-from teams import Team, MatchUp
+from teams import MatchUp, TeamRegistry
 from tournament import Tournament
 from seed import Seed
 
-from collections import defaultdict
-
 
 class Season:
     """
@@ -22,24 +28,91 @@ class Season:
     there are a total of 372 division 1 teams, and the 2022 season has 358 division 1 teams. The excess of
     teams represents about 4 % of yearly division 1 teams, deemed marginal.
 
-    Storing teams data within each season is redundant though. Because we follow an all in-memory approach
-    (no databases), and we need teams meta data available at the season level, we decided to go with that
-    redundancy. The impact is minimal because we have less than 40 seasons and 400 teams.
+    That meta data lives in a single immutable TeamRegistry shared by all seasons, rather than being copied
+    into each season.
 
     Seasons start in late fall of year n and end with the National Collegiate Athletic Association (NCAA)
     championship played in early spring of year n+1.
     We refer to a season's year by using the year the NCAA tournament for that season was played (n+1 above).
     """
 
+    # Default features fed to the classifiers, by name and in feature vector order. The candidate features are the
+    # keys of the absolute and relative feature getters.
+    ABSOLUTE_FEATURES: [str] = ["seeds_positions", "adjusted_win_pct", "gap_average"]
+    RELATIVE_FEATURES: [str] = ["seeds_diff"]
+
     def __init__(self, year: int, day_zero: str, regular_season_games: [Game], rankings: Dict,
                  tournament_games: [Game], region_w: str, region_x: str, region_y: str, region_z: str, seeds: [Seed],
-                 teams: [Team]):
-        self.qualified_teams_ids: [str] = sorted([seed.team_id for seed in seeds])
-        self.regular_season: RegularSeason = RegularSeason(year, day_zero, regular_season_games, self.qualified_teams_ids)
-        self.tournament: Tournament = Tournament(year, tournament_games, region_w, region_x, region_y, region_z, seeds, rankings)
-        self.teams: Dict[int, Team] = {}
-        for team in teams:
-            self.teams[team.id] = team
+                 teams: TeamRegistry):
+        with profiler.stage("season", year=year):
+            self.qualified_teams_ids: [str] = sorted([seed.team_id for seed in seeds])
+            with profiler.stage("regular_season", year=year):
+                self.regular_season: RegularSeason = RegularSeason(year, day_zero, regular_season_games,
+                                                                   self.qualified_teams_ids, teams)
+                profiler.count(len(regular_season_games))
+            self.tournament: Tournament = Tournament(year, tournament_games, region_w, region_x, region_y, region_z,
+                                                     seeds, rankings)
+            self.teams: TeamRegistry = teams
+
+        self.absolute_features_getters: Dict[str, Callable[[MatchUp], AbsoluteFeature]] = {
+            "seeds_positions": self.tournament.get_seeds_positions,
+            "rankings": self.tournament.get_rankings,
+            "win_ratio": self.regular_season.get_win_ratio,
+            "gap_average": self.regular_season.get_gap_average,
+            "adjusted_win_pct": self.regular_season.get_adjusted_win_pct,
+            "average_points_allowed": self.regular_season.get_average_points_allowed,
+            "average_points_scored": self.regular_season.get_average_points_scored,
+            "net_efficiency": self.regular_season.get_net_efficiency,
+            "recent_margin": self.regular_season.get_recent_margin,
+            "recent_win_pct": self.regular_season.get_recent_win_pct,
+            "late_season_margin": self.regular_season.get_late_season_margin,
+        }
+        self.relative_features_getters: Dict[str, Callable[[MatchUp], RelativeFeature]] = {
+            "seeds_diff": self.tournament.get_seeds_diff,
+            "ranking_diff": self.tournament.get_ranking_diff,
+            "bracket_positions": self.tournament.get_bracket_positions,
+            "win_ratio_diff": self.regular_season.get_win_ratio_diff,
+            "gap_average_diff": self.regular_season.get_gap_average_diff,
+            "common_opponents": self.regular_season.get_common_opponents,
+            "common_opponents_margin": self.regular_season.get_common_opponents_margin,
+        }
+        # All-pairs prediction features and labels, built on first prediction (see get_prediction_data).
+        self._prediction_data = None
+        self.set_features(Season.ABSOLUTE_FEATURES, Season.RELATIVE_FEATURES)
+
+    """
+    Selects the features, by name, used to build match-up feature vectors. Changing the features invalidates the
+    cached prediction features.
+    """
+
+    def set_features(self, absolute_features: [str], relative_features: [str]):
+        for name in absolute_features:
+            assert name in self.absolute_features_getters, f"Unknown absolute feature {name}."
+        for name in relative_features:
+            assert name in self.relative_features_getters, f"Unknown relative feature {name}."
+
+        if self._prediction_data is not None and \
+                (list(absolute_features), list(relative_features)) != (self.absolute_features, self.relative_features):
+            self.clear_prediction_data()
+
+        self.absolute_features: [str] = list(absolute_features)
+        self.relative_features: [str] = list(relative_features)
+
+    """
+    Returns the name of each column of the feature vectors: absolute features take two columns (one per team),
+    relative features a single one.
+    """
+
+    @property
+    def feature_layout(self) -> [str]:
+        return Season.get_feature_layout(self.absolute_features, self.relative_features)
+
+    @staticmethod
+    def get_feature_layout(absolute_features: [str], relative_features: [str]) -> [str]:
+        layout = []
+        for name in absolute_features:
+            layout.extend([f"{name}_1", f"{name}_2"])
+        return layout + list(relative_features)
 
     """
     Returns float features for the specified match-up.
@@ -78,25 +151,14 @@ class Season:
     """
 
     def build_relative_features(self, match_up: MatchUp) -> [RelativeFeature]:
-        # ranking_diff_feature = self.tournament.get_ranking_diff(match_up)
-        seeds_diff_feature = self.tournament.get_seeds_diff(match_up)
-        win_ratio_diff_feature = self.regular_season.get_win_ratio_diff(match_up)
-        gap_avg_diff_feature = self.regular_season.get_gap_average_diff(match_up)
-
-        return [seeds_diff_feature]
+        return [self.relative_features_getters[name](match_up) for name in self.relative_features]
 
     """
     Absolute features for a potential match-up in this season's NCAA tournament. 
     """
 
     def build_absolute_features(self, match_up: MatchUp) -> [AbsoluteFeature]:
-        seed_position_feature = self.tournament.get_seeds_positions(match_up)
-        # rankings_feature = self.tournament.get_rankings(match_up)
-        # win_ratio_feature = self.regular_season.get_win_ratio(match_up)
-        gap_avg_feature = self.regular_season.get_gap_average(match_up)
-        adjusted_win_pct_feature = self.regular_season.get_adjusted_win_pct(match_up)
-
-        return [seed_position_feature, adjusted_win_pct_feature, gap_avg_feature]
+        return [self.absolute_features_getters[name](match_up) for name in self.absolute_features]
 
     """
     Returns a labelled data set using the actual tournament games that occurred that season. The output is a tuple
@@ -117,34 +179,91 @@ class Season:
             season_labels.extend([1, 0])
         return season_features, season_labels
 
+    """
+    Returns the IDs of both teams, the features matrix and the labels (expected outcomes) of each potential
+    tournament match-up team_1 vs. team_2, with team_1's ID strictly smaller than team_2's ID.
+
+    Features only depend on the season and the selected features, not on the classifier: they are built once and
+    cached, so that any number of classifiers predict from the same matrix. The cache is invalidated when the
+    selected features change (see set_features).
+    """
+
+    def get_prediction_data(self):
+        if self._prediction_data is None:
+            # Sorted array (ascending) of IDs of teams which participate to this season's NCAA tournament.
+            tournament_teams_ids: [int] = self.tournament.team_ids
+
+            """
+            Go through the upper triangular matrix (without the diagonal: teams don't play themselves!). Number of
+            match-ups: n * (n - 1) / 2, where n = number of teams.
+            """
+            team_1_ids, team_2_ids = np.triu_indices(len(tournament_teams_ids), k=1)
+            team_1_ids = np.array(tournament_teams_ids, dtype=np.int64)[team_1_ids]
+            team_2_ids = np.array(tournament_teams_ids, dtype=np.int64)[team_2_ids]
+
+            features = [self.get_match_up_features(MatchUp(team_1_id, team_2_id))[0]
+                        for team_1_id, team_2_id in zip(team_1_ids.tolist(), team_2_ids.tolist())]
+            labels = [self.tournament.get_expected_outcome(team_1_id, team_2_id)
+                      for team_1_id, team_2_id in zip(team_1_ids.tolist(), team_2_ids.tolist())]
+
+            self._prediction_data = (team_1_ids, team_2_ids,
+                                     np.array(features, dtype=np.float64).reshape(len(labels),
+                                                                                  len(self.feature_layout)),
+                                     np.array(labels, dtype=np.int64))
+        return self._prediction_data
+
+    """
+    Drops the cached prediction features: the next prediction builds them again.
+    """
+
+    def clear_prediction_data(self):
+        self._prediction_data = None
+
     """
     Returns predictions for each of the potential tournament match-up for this season's NCAA tournament. 
     
     Because a match-up can be viewed as "team_1 vs. team_2" or "team_2 vs. team_1", and the predictions for these
     two point of views always sum up to 1 (no draws), we only output predictions for "team_1 vs. team_2" views, where
     the team_1's ID is strictly smaller than team_2's ID. That rule is enforced at the Sample class level.
+
+    Classifiers predicting from a features matrix (predict_proba_features) get the cached matrix directly.
     """
 
     def predict(self, classifier: Classifier) -> [Sample]:
-        # Sorted array (ascending) of IDs of teams which participate to this season's NCAA tournament.
-        tournament_teams_ids: [int] = self.tournament.team_ids
-
-        """
-        Go through the upper triangular matrix (without the diagonal: teams don't play themselves!) and predict the
-        winning probability of team_1 vs. team_2. Number of match-ups: n * (n - 1) / 2, where n = number of teams. 
-        """
+        with profiler.stage("season.predict", year=self.year):
+            team_1_ids, team_2_ids, features, labels = self.get_prediction_data()
+            samples: [Sample] = [Sample(team_1_id, team_2_id, match_up_features, label)
+                                 for team_1_id, team_2_id, match_up_features, label
+                                 in zip(team_1_ids.tolist(), team_2_ids.tolist(), features, labels.tolist())]
+
+            # Seasons without tournament teams have nothing to predict, and estimators reject empty matrices.
+            if not samples:
+                classes_probabilities = []
+            elif hasattr(classifier, "predict_proba_features"):
+                classes_probabilities = classifier.predict_proba_features(features)
+            else:
+                classes_probabilities = classifier.predict_proba(samples)
+            for idx, sample in enumerate(samples):
+                sample.win_p = classes_probabilities[idx][1]
+
+            profiler.count(len(samples))
+        return samples
 
-        samples: [Sample] = []
-        for idx_1, team_1_id in enumerate(tournament_teams_ids):
-            # No need to enumerate for second team, we only use that team's ID.
-            for team_2_id in tournament_teams_ids[idx_1 + 1:]:
-                samples.append(self.get_sample(team_1_id, team_2_id))
+    """
+    Returns the live bracket of this season's tournament (see Tournament.get_live_bracket), with the classifier's
+    win probabilities for every potential match-up.
+    """
 
-        classes_probabilities = classifier.predict_proba(samples)
-        for idx, sample in enumerate(samples):
-            sample.win_p = classes_probabilities[idx][1]
+    def get_live_bracket(self, classifier: Classifier) -> LiveBracket:
+        team_ids = self.tournament.team_ids
+        indices = {team_id: idx for idx, team_id in enumerate(team_ids)}
 
-        return samples
+        win_p = np.full((len(team_ids), len(team_ids)), 0.5)
+        for sample in self.predict(classifier):
+            idx_1, idx_2 = indices[sample.team_1_id], indices[sample.team_2_id]
+            win_p[idx_1, idx_2] = sample.win_p
+            win_p[idx_2, idx_1] = 1 - sample.win_p
+        return self.tournament.get_live_bracket(win_p)
 
     """
     Get sample for team_1 vs. team_2 match-up.
@@ -167,6 +286,33 @@ class Season:
     def get_seeds_based_classifier(self) -> Classifier:
         return SeedsBasedClassifier(self.tournament.seeds)
 
+    """
+    Returns a heuristic classifier of this season, by name:
+    - "seeds_linear": SeedsBasedClassifier;
+    - "seeds_logistic": SeedsLogisticClassifier;
+    - "rating": RatingDifferenceClassifier, on a per-team regular season statistic (e.g. "gap_average").
+    The parameter defaults to the classifier's default parameter.
+    """
+
+    def get_heuristic_classifier(self, heuristic: str, parameter: float = None,
+                                 rating: str = "gap_average") -> TeamValuesClassifier:
+        if heuristic == "seeds_linear":
+            return SeedsBasedClassifier(self.tournament.seeds, parameter)
+        if heuristic == "seeds_logistic":
+            return SeedsLogisticClassifier(self.tournament.seeds, parameter)
+        if heuristic == "rating":
+            return RatingDifferenceClassifier(self.teams.ids, getattr(self.regular_season, rating), parameter)
+        raise ValueError(f"Unknown heuristic {heuristic}.")
+
+    """
+    Returns the arrays of winning and losing team IDs of this season's tournament games.
+    """
+
+    def get_tournament_games_ids(self):
+        w_team_ids = np.array([game.w_team_id for game in self.tournament.tournament_games], dtype=np.int64)
+        l_team_ids = np.array([game.l_team_id for game in self.tournament.tournament_games], dtype=np.int64)
+        return w_team_ids, l_team_ids
+
 
 class RegularSeason:
     """
@@ -175,131 +321,221 @@ class RegularSeason:
 
     The day zero serves as an origin date specific to that season and allows us to refer to commonly refer to day
     numbers for all seasons.
+
+    Per-team statistics are arrays indexed by the dense indices of the shared team registry.
+
+    Recent form statistics (see RecentForm) cover all of a team's games, not only those against tournament teams:
+    the last RECENT_GAMES games, and the last LATE_SEASON_DAYS days of the regular season.
     """
 
-    def __init__(self, year: int, day_zero: str, regular_season_games: [Game], qualified_teams_ids: [str]):
+    RECENT_GAMES: int = 10
+    LATE_SEASON_DAYS: int = 30
+
+    def __init__(self, year: int, day_zero: str, regular_season_games: [Game], qualified_teams_ids: [str],
+                 teams: TeamRegistry):
         self.year: int = year
         self.day_zero: str = day_zero
         self.regular_season_games: [Game] = regular_season_games
         self.qualified_teams_ids: [str] = qualified_teams_ids
-
-        self.total_points_allowed: Dict[int, int] = defaultdict(lambda: 0)
-        self.total_points_scored: Dict[int, int] = defaultdict(lambda: 0)
-        self.number_games_played: Dict[int, int] = defaultdict(lambda: 0)
-        self.number_games_won: Dict[int, int] = defaultdict(lambda: 0)
-        self.score_gap: Dict[int, int] = defaultdict(lambda: 0)
-        self.adjusted_nb_wins: Dict[int, float] = defaultdict(lambda: 0)
-        self.net_efficiency: Dict[int, float] = defaultdict(lambda: 0)
-
-        for game in self.regular_season_games:
-            w_team_id = game.w_team_id
-            l_team_id = game.l_team_id
-            location = game.w_loc
-
-            # Only consider regular season games involving tournament teams.
-            if w_team_id in self.qualified_teams_ids and l_team_id in self.qualified_teams_ids:
-                self.total_points_allowed[w_team_id] += game.l_score
-                self.total_points_allowed[l_team_id] += game.w_score
-                self.total_points_scored[w_team_id] += game.w_score
-                self.total_points_scored[l_team_id] += game.l_score
-                self.number_games_played[w_team_id] += 1
-                self.number_games_played[l_team_id] += 1
-                self.number_games_won[w_team_id] += 1
-
-                self.score_gap[w_team_id] += game.w_score - game.l_score
-                self.score_gap[l_team_id] += game.l_score - game.w_score
-
-                if self.year >= 2003:
-                    self.net_efficiency[w_team_id] += game.get_w_team_offensive_efficiency() - game.get_l_team_offensive_efficiency()
-                    self.net_efficiency[l_team_id] += -1 * (game.get_w_team_offensive_efficiency() - game.get_l_team_offensive_efficiency())
-
-                if location == "H":
-                    self.adjusted_nb_wins[w_team_id] += 0.6
-                    self.adjusted_nb_wins[l_team_id] -= 0.6
-                elif location == "A":
-                    self.adjusted_nb_wins[w_team_id] += 1.4
-                    self.adjusted_nb_wins[l_team_id] -= 1.4
-                elif location == "N":
-                    self.adjusted_nb_wins[w_team_id] += 1
-                    self.adjusted_nb_wins[l_team_id] -= 1
-
-        self.average_points_allowed: Dict[int, float] = {}
-        for team_id, total_points in self.total_points_allowed.items():
-            self.average_points_allowed[team_id] = total_points / self.number_games_played[team_id]
+        self.teams: TeamRegistry = teams
+
+        number_teams = len(teams)
+        qualified = teams.mask(qualified_teams_ids)
+
+        all_w_idx = teams.indices([game.w_team_id for game in self.regular_season_games])
+        all_l_idx = teams.indices([game.l_team_id for game in self.regular_season_games])
+
+        # Only consider regular season games involving tournament teams.
+        is_qualified_game = qualified[all_w_idx] & qualified[all_l_idx]
+        games = [game for game, keep in zip(self.regular_season_games, is_qualified_game) if keep]
+        w_idx = all_w_idx[is_qualified_game]
+        l_idx = all_l_idx[is_qualified_game]
+        w_score = np.array([game.w_score for game in games], dtype=float)
+        l_score = np.array([game.l_score for game in games], dtype=float)
+        w_loc = np.array([game.w_loc for game in games], dtype=object)
+
+        def per_team(w_values, l_values) -> np.ndarray:
+            return np.bincount(w_idx, weights=w_values, minlength=number_teams) + \
+                np.bincount(l_idx, weights=l_values, minlength=number_teams)
+
+        self.total_points_allowed: np.ndarray = per_team(l_score, w_score)
+        self.total_points_scored: np.ndarray = per_team(w_score, l_score)
+        self.number_games_played: np.ndarray = np.bincount(w_idx, minlength=number_teams) + \
+            np.bincount(l_idx, minlength=number_teams)
+        self.number_games_won: np.ndarray = np.bincount(w_idx, minlength=number_teams)
+        self.score_gap: np.ndarray = per_team(w_score - l_score, l_score - w_score)
+
+        self.net_efficiency: np.ndarray = np.zeros(number_teams)
+        if self.year >= 2003:
+            net = np.array([game.get_w_team_offensive_efficiency() - game.get_l_team_offensive_efficiency()
+                            for game in games], dtype=float)
+            self.net_efficiency = per_team(net, -1 * net)
+
+        location_weights = np.select([w_loc == "H", w_loc == "A", w_loc == "N"], [0.6, 1.4, 1.0], 0.0)
+        self.adjusted_nb_wins: np.ndarray = per_team(location_weights, -1 * location_weights)
 
         # In case there is a qualified team which didn't play any other qualified teams during
-        # the regular season, we return an average number of points. Maybe try -1.
-        assert len(self.average_points_allowed) > 0, f"No teams played in {self.year}"
-        teams_average_points_allowed = sum(self.average_points_allowed.values()) / len(self.average_points_allowed)
-        self.average_points_allowed = defaultdict(lambda: teams_average_points_allowed, self.average_points_allowed)
-
-        self.average_points_scored: Dict[int, float] = {}
-        for team_id, total_points in self.total_points_scored.items():
-            self.average_points_scored[team_id] = total_points / self.number_games_played[team_id]
-
-        # Same for points scored.
-        teams_average_points_scored = sum(self.average_points_scored.values()) / len(self.average_points_scored)
-        self.average_points_scored = defaultdict(lambda: teams_average_points_scored, self.average_points_scored)
-
-        self.adjusted_win_pct = {}
-        self.average_net_efficiency = {}
-        self.win_ratio = defaultdict(lambda: 0)
-        self.gap_average = defaultdict(lambda: 0)
-        for team_id, number_games_played in self.number_games_played.items():
-            self.adjusted_win_pct[team_id] = self.adjusted_nb_wins[team_id] / number_games_played
-            if self.year >= 2023:
-                self.average_net_efficiency[team_id] = self.net_efficiency[team_id] / number_games_played
-            self.win_ratio[team_id] = self.number_games_won[team_id] / number_games_played
-            self.gap_average[team_id] = self.score_gap[team_id] / number_games_played
-
-        # Same for adjusted win percentage and net efficiency
-        teams_avg_adjusted_win_pct = sum(self.adjusted_win_pct.values()) / len(self.adjusted_win_pct)
-        self.adjusted_win_pct = defaultdict(lambda: teams_avg_adjusted_win_pct, self.adjusted_win_pct)
+        # the regular season, we return an average value over the teams which played. Maybe try -1.
+        played = self.number_games_played > 0
+        assert played.any(), f"No teams played in {self.year}"
+        games_played = np.where(played, self.number_games_played, 1)
+
+        def average_over_played(totals: np.ndarray) -> np.ndarray:
+            averages = totals / games_played
+            return np.where(played, averages, averages[played].mean())
 
+        self.average_points_allowed: np.ndarray = average_over_played(self.total_points_allowed)
+        self.average_points_scored: np.ndarray = average_over_played(self.total_points_scored)
+        self.adjusted_win_pct: np.ndarray = average_over_played(self.adjusted_nb_wins)
+
+        self.average_net_efficiency: np.ndarray = np.zeros(number_teams)
         if self.year >= 2023:
-            teams_avg_net_efficiency = sum(self.average_net_efficiency.values()) / len(self.average_net_efficiency)
-            self.average_net_efficiency = defaultdict(lambda: teams_avg_net_efficiency, self.average_net_efficiency)
+            self.average_net_efficiency = average_over_played(self.net_efficiency)
+
+        self.win_ratio: np.ndarray = np.where(played, self.number_games_won / games_played, 0)
+        self.gap_average: np.ndarray = np.where(played, self.score_gap / games_played, 0)
+
+        self._games_index: TeamGamesIndex = None
+        self._recent_form: RecentForm = None
+        self._recent_statistics: Dict[str, np.ndarray] = None
+        self._common_opponents: CommonOpponents = None
+
+    """
+    Index of each team's games (all of them, not only against qualified teams), sorted by day. Built on first use
+    (schedule queries, recent form, prediction grid), once per season.
+    """
+
+    @property
+    def games_index(self) -> TeamGamesIndex:
+        if self._games_index is None:
+            self._games_index = TeamGamesIndex(self.regular_season_games, self.teams)
+        return self._games_index
+
+    """
+    Windowed aggregates of the season's games, computed on first use (once per season) like common_opponents: the
+    teams x days table is only needed when form features are selected.
+    """
+
+    @property
+    def recent_form(self) -> RecentForm:
+        if self._recent_form is None:
+            self._recent_form = RecentForm(self.regular_season_games, self.games_index)
+        return self._recent_form
+
+    def _get_recent_statistics(self) -> Dict[str, np.ndarray]:
+        if self._recent_statistics is None:
+            recent_games = self.recent_form.last_games(RegularSeason.RECENT_GAMES)
+            self._recent_statistics = {
+                "recent_margin": recent_games.average_margin,
+                "recent_win_pct": recent_games.win_pct,
+                "late_season_margin": self.recent_form.last_days(RegularSeason.LATE_SEASON_DAYS).average_margin,
+            }
+        return self._recent_statistics
+
+    @property
+    def recent_margin(self) -> np.ndarray:
+        return self._get_recent_statistics()["recent_margin"]
+
+    @property
+    def recent_win_pct(self) -> np.ndarray:
+        return self._get_recent_statistics()["recent_win_pct"]
+
+    @property
+    def late_season_margin(self) -> np.ndarray:
+        return self._get_recent_statistics()["late_season_margin"]
+
+    """
+    Common opponents of the tournament teams, computed on first use (once per season) as they are only needed
+    when selected as features.
+    """
+
+    @property
+    def common_opponents(self) -> CommonOpponents:
+        if self._common_opponents is None:
+            self._common_opponents = CommonOpponents(self.regular_season_games, self.teams, self.qualified_teams_ids)
+        return self._common_opponents
+
+    """
+    Returns the values of a per-team statistic array for both teams of a match-up.
+    """
+
+    def _match_up_values(self, values: np.ndarray, match_up: MatchUp):
+        return values[self.teams.index(match_up.team_1_id)], values[self.teams.index(match_up.team_2_id)]
 
     def get_gap_average_diff(self, match_up: MatchUp) -> Feature:
-        diff = self.gap_average[match_up.team_1_id] - self.gap_average[match_up.team_2_id]
+        team_1_value, team_2_value = self._match_up_values(self.gap_average, match_up)
+        diff = team_1_value - team_2_value
         return RelativeFeature(diff, -1 * diff)
 
     def get_gap_average(self, match_up: MatchUp) -> Feature:
-        return AbsoluteFeature(self.gap_average[match_up.team_1_id], self.gap_average[match_up.team_2_id])
+        return AbsoluteFeature(*self._match_up_values(self.gap_average, match_up))
 
     def get_win_ratio_diff(self, match_up: MatchUp) -> Feature:
-        diff = self.win_ratio[match_up.team_1_id] - self.win_ratio[match_up.team_2_id]
+        team_1_value, team_2_value = self._match_up_values(self.win_ratio, match_up)
+        diff = team_1_value - team_2_value
         return RelativeFeature(diff, -1 * diff)
 
     def get_win_ratio(self, match_up: MatchUp) -> Feature:
-        return AbsoluteFeature(self.win_ratio[match_up.team_1_id], self.win_ratio[match_up.team_2_id])
+        return AbsoluteFeature(*self._match_up_values(self.win_ratio, match_up))
 
     def get_average_points_allowed(self, match_up: MatchUp) -> Feature:
-        return AbsoluteFeature(self.average_points_allowed[match_up.team_1_id],
-                               self.average_points_allowed[match_up.team_2_id])
+        return AbsoluteFeature(*self._match_up_values(self.average_points_allowed, match_up))
 
     def get_average_points_scored(self, match_up: MatchUp) -> Feature:
-        return AbsoluteFeature(self.average_points_scored[match_up.team_1_id],
-                               self.average_points_scored[match_up.team_2_id])
+        return AbsoluteFeature(*self._match_up_values(self.average_points_scored, match_up))
 
     def get_adjusted_win_pct(self, match_up: MatchUp) -> Feature:
-        return AbsoluteFeature(self.adjusted_win_pct[match_up.team_1_id],
-                               self.adjusted_win_pct[match_up.team_2_id])
+        return AbsoluteFeature(*self._match_up_values(self.adjusted_win_pct, match_up))
 
     def get_net_efficiency(self, match_up: MatchUp) -> Feature:
-        return AbsoluteFeature(self.average_net_efficiency[match_up.team_1_id],
-                               self.average_net_efficiency[match_up.team_2_id])
+        return AbsoluteFeature(*self._match_up_values(self.average_net_efficiency, match_up))
+
+    def get_recent_margin(self, match_up: MatchUp) -> Feature:
+        return AbsoluteFeature(*self._match_up_values(self.recent_margin, match_up))
+
+    def get_recent_win_pct(self, match_up: MatchUp) -> Feature:
+        return AbsoluteFeature(*self._match_up_values(self.recent_win_pct, match_up))
+
+    def get_late_season_margin(self, match_up: MatchUp) -> Feature:
+        return AbsoluteFeature(*self._match_up_values(self.late_season_margin, match_up))
+
+    def get_common_opponents(self, match_up: MatchUp) -> Feature:
+        count = self.common_opponents.get_count(match_up.team_1_id, match_up.team_2_id)
+        return RelativeFeature(count, count)
+
+    def get_common_opponents_margin(self, match_up: MatchUp) -> Feature:
+        margin = self.common_opponents.get_margin(match_up.team_1_id, match_up.team_2_id)
+        return RelativeFeature(margin, -1 * margin)
 
     def get_record(self, team_id: int) -> float:
         assert type(team_id) == int, f"Team ID {team_id} is not an integer."
 
-        won_games = 0
-        lost_games = 0
-        for game in self.regular_season_games:
-            if game.w_team_id == team_id:
-                won_games += 1
-            elif game.l_team_id == team_id:
-                lost_games += 1
-        assert won_games + lost_games != 0, f"No game records for team {team_id} during the {self.year - 1}-{self.year}" \
-                                            f" regular season."
-        return won_games / (won_games + lost_games)
+        won = self.games_index.won[self.games_index.get_slice(team_id)]
+        assert len(won) != 0, f"No game records for team {team_id} during the {self.year - 1}-{self.year}" \
+                              f" regular season."
+        return float(won.sum() / len(won))
+
+    """
+    Returns the regular season games of a team, sorted by day.
+    """
+
+    def get_schedule(self, team_id: int) -> [Game]:
+        positions = self.games_index.positions[self.games_index.get_slice(team_id)]
+        return [self.regular_season_games[position] for position in positions]
+
+    """
+    Returns the regular season games between two teams, sorted by day.
+    """
+
+    def get_head_to_head(self, team_1_id: int, team_2_id: int) -> [Game]:
+        entries = self.games_index.get_slice(team_1_id)
+        against = self.games_index.opponents[entries] == self.teams.index(team_2_id)
+        return [self.regular_season_games[position] for position in self.games_index.positions[entries][against]]
+
+    """
+    Returns the IDs of the teams a team played against during the regular season.
+    """
+
+    def get_opponents(self, team_id: int) -> {int}:
+        opponents = self.games_index.opponents[self.games_index.get_slice(team_id)]
+        return set(self.teams.ids[np.unique(opponents)].tolist())
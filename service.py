@@ -0,0 +1,349 @@
+import asyncio
+import json
+import logging
+import time
+from collections import deque
+from typing import Dict, Tuple
+from urllib.parse import parse_qs, urlsplit
+
+import numpy as np
+
+from classifier import Classifier
+from sample import Sample
+from season import Season
+
+
+class ServiceError(Exception):
+    """
+    Error answered to the client with an HTTP status code (400 for bad queries, 404 for unknown routes, 500 for
+    failed batch predictions).
+    """
+
+    def __init__(self, status: int, message: str):
+        super().__init__(message)
+        self.status: int = status
+
+
+class ServiceMetrics:
+    """
+    Request counts, cache hits and misses, micro-batches and latency percentiles over the most recent requests.
+    """
+
+    def __init__(self, window: int = 10000):
+        self.started_at: float = time.time()
+        self.requests: int = 0
+        self.pairs: int = 0
+        self.cache_hits: int = 0
+        self.cache_misses: int = 0
+        self.batches: int = 0
+        self.errors: int = 0
+        self.latencies: deque = deque(maxlen=window)
+        self.timestamps: deque = deque(maxlen=window)
+
+    def record_request(self, latency: float, pairs: int):
+        self.requests += 1
+        self.pairs += pairs
+        self.latencies.append(latency)
+        self.timestamps.append(time.time())
+
+    def to_dict(self) -> Dict:
+        now = time.time()
+        uptime = now - self.started_at
+        last_minute = sum(1 for timestamp in self.timestamps if now - timestamp <= 60)
+
+        latencies = {}
+        if self.latencies:
+            p50, p95, p99 = np.percentile(np.array(self.latencies) * 1000, [50, 95, 99])
+            latencies = {"p50_ms": p50, "p95_ms": p95, "p99_ms": p99, "max_ms": max(self.latencies) * 1000}
+
+        return {
+            "uptime_s": uptime,
+            "requests": self.requests,
+            "pairs": self.pairs,
+            "errors": self.errors,
+            "cache_hits": self.cache_hits,
+            "cache_misses": self.cache_misses,
+            "batches": self.batches,
+            "requests_per_s": self.requests / uptime if uptime else 0,
+            "requests_last_minute": last_minute,
+            "latency": latencies,
+        }
+
+
+class PredictionService:
+    """
+    Answers "year, team_1, team_2" queries with the probability that team_1 beats team_2, from memory.
+
+    At startup, the probability of every potential tournament match-up of the preloaded seasons is computed once
+    (Season.predict) and stored in a matrix per season, indexed by the seeded teams. Queries on other seasons are
+    cache misses: misses arriving within the same batch window are micro-batched into a single vectorized
+    predict_proba call, then cached. Features are never recomputed per request.
+
+    Only seeded teams can be queried: features rely on tournament seeds.
+    """
+
+    def __init__(self, seasons: Dict[int, Season], classifier: Classifier, preload_years: [int] = (),
+                 batch_window: float = 0.002, max_batch_size: int = 4096):
+        self.seasons: Dict[int, Season] = seasons
+        self.classifier: Classifier = classifier
+        self.batch_window: float = batch_window
+        self.max_batch_size: int = max_batch_size
+        self.metrics: ServiceMetrics = ServiceMetrics()
+        self.logger = self._get_logger()
+
+        # Probability matrices of the preloaded seasons: year -> (team ID -> row/column index, matrix).
+        self.matrices: Dict[int, Tuple[Dict[int, int], np.ndarray]] = {}
+        for year in preload_years:
+            self.matrices[year] = self._build_matrix(year)
+
+        # Probabilities computed on cache misses, keyed by (year, team_1_id, team_2_id) with team_1_id < team_2_id.
+        self.cache: Dict[Tuple[int, int, int], float] = {}
+        self._pending: Dict[Tuple[int, int, int], asyncio.Future] = {}
+        self._queue: asyncio.Queue = None
+
+    @staticmethod
+    def _get_logger():
+        return logging.getLogger(__name__)
+
+    def _build_matrix(self, year: int) -> Tuple[Dict[int, int], np.ndarray]:
+        season = self._get_season(year)
+        team_ids = season.tournament.team_ids
+        indices = {team_id: idx for idx, team_id in enumerate(team_ids)}
+
+        matrix = np.full((len(team_ids), len(team_ids)), 0.5, dtype=np.float32)
+        for sample in season.predict(self.classifier):
+            idx_1, idx_2 = indices[sample.team_1_id], indices[sample.team_2_id]
+            matrix[idx_1, idx_2] = sample.win_p
+            matrix[idx_2, idx_1] = 1 - sample.win_p
+
+        self.logger.info(f'Preloaded {len(team_ids) * (len(team_ids) - 1) // 2} match-ups for {year}.')
+        return indices, matrix
+
+    def _get_season(self, year: int) -> Season:
+        season = self.seasons.get(year)
+        if not season:
+            raise ServiceError(400, f"No season {year}.")
+        return season
+
+    def _validate(self, year: int, team_1_id: int, team_2_id: int):
+        season = self._get_season(year)
+        for team_id in [team_1_id, team_2_id]:
+            if team_id not in season.tournament.seeds:
+                raise ServiceError(400, f"Team {team_id} is not seeded in {year}.")
+        if team_1_id == team_2_id:
+            raise ServiceError(400, f"Team {team_1_id} can't play itself.")
+
+    """
+    Returns the probability that team_1 beats team_2 if it's known without computing anything, None otherwise.
+    """
+
+    def lookup(self, year: int, team_1_id: int, team_2_id: int):
+        if year in self.matrices:
+            indices, matrix = self.matrices[year]
+            return float(matrix[indices[team_1_id], indices[team_2_id]])
+
+        low_id, high_id = min(team_1_id, team_2_id), max(team_1_id, team_2_id)
+        win_p = self.cache.get((year, low_id, high_id))
+        if win_p is None:
+            return None
+        return win_p if team_1_id == low_id else 1 - win_p
+
+    async def predict(self, queries: [Tuple[int, int, int]]) -> [float]:
+        results = []
+        misses = {}
+        for year, team_1_id, team_2_id in queries:
+            self._validate(year, team_1_id, team_2_id)
+            win_p = self.lookup(year, team_1_id, team_2_id)
+            results.append(win_p)
+            if win_p is None:
+                self.metrics.cache_misses += 1
+                key = (year, min(team_1_id, team_2_id), max(team_1_id, team_2_id))
+                misses[key] = self._submit(key)
+            else:
+                self.metrics.cache_hits += 1
+
+        if misses:
+            # Shielded: a cancelled request doesn't cancel the computations other requests share.
+            await asyncio.gather(*[asyncio.shield(future) for future in misses.values()])
+            results = [self.lookup(*query) for query in queries]
+        return results
+
+    def _submit(self, key: Tuple[int, int, int]) -> asyncio.Future:
+        # Identical misses share the same pending computation.
+        if key not in self._pending:
+            self._pending[key] = asyncio.get_running_loop().create_future()
+            self._get_queue().put_nowait(key)
+        return self._pending[key]
+
+    def _get_queue(self) -> asyncio.Queue:
+        # Created lazily, from within the running event loop.
+        if self._queue is None:
+            self._queue = asyncio.Queue()
+        return self._queue
+
+    """
+    Collects cache misses for a batch window, computes them with a single predict_proba call off the event loop,
+    caches them and resolves the pending futures. A failed batch fails its futures with a 500 ServiceError, so that
+    its errors aren't mistaken for malformed queries.
+    """
+
+    async def run_batcher(self):
+        queue = self._get_queue()
+        loop = asyncio.get_running_loop()
+        while True:
+            keys = [await queue.get()]
+            deadline = loop.time() + self.batch_window
+            while len(keys) < self.max_batch_size:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    keys.append(await asyncio.wait_for(queue.get(), timeout))
+                except asyncio.TimeoutError:
+                    break
+
+            try:
+                win_ps = await loop.run_in_executor(None, self._predict_batch, keys)
+                error = None
+            except Exception as exception:
+                self.logger.exception("Batch prediction failed.")
+                win_ps, error = [], ServiceError(500, f"Prediction failed: {exception!r}")
+
+            self.metrics.batches += 1
+            for idx, key in enumerate(keys):
+                future = self._pending.pop(key)
+                if error is None:
+                    self.cache[key] = win_ps[idx]
+                # Cancelled futures are done already: resolving them would raise and stop the batcher.
+                if future.done():
+                    continue
+                if error is not None:
+                    future.set_exception(error)
+                else:
+                    future.set_result(win_ps[idx])
+
+    """
+    Predicts match-ups (year, team_1_id, team_2_id) with team_1_id < team_2_id, from the rows of their seasons'
+    cached all-pairs features (Season.get_prediction_data): features aren't rebuilt per match-up.
+    """
+
+    def _predict_batch(self, keys: [Tuple[int, int, int]]) -> [float]:
+        keys = np.array(keys, dtype=np.int64).reshape(-1, 3)
+        win_ps = np.empty(len(keys))
+        for year in np.unique(keys[:, 0]).tolist():
+            positions = np.flatnonzero(keys[:, 0] == year)
+            season = self.seasons[year]
+            team_1_ids, team_2_ids, features, labels = season.get_prediction_data()
+
+            # Rows follow np.triu_indices order over the sorted tournament teams: row of teams i < j.
+            team_ids = np.asarray(season.tournament.team_ids, dtype=np.int64)
+            idx_1 = np.searchsorted(team_ids, keys[positions, 1])
+            idx_2 = np.searchsorted(team_ids, keys[positions, 2])
+            rows = idx_1 * len(team_ids) - idx_1 * (idx_1 + 1) // 2 + idx_2 - idx_1 - 1
+            assert np.array_equal(team_1_ids[rows], keys[positions, 1]) and \
+                   np.array_equal(team_2_ids[rows], keys[positions, 2]), f"Unknown match-ups in {year}."
+
+            if hasattr(self.classifier, "predict_proba_features"):
+                classes_probabilities = self.classifier.predict_proba_features(features[rows])
+            else:
+                classes_probabilities = self.classifier.predict_proba(
+                    [Sample(team_1_id, team_2_id, match_up_features, label) for team_1_id, team_2_id,
+                     match_up_features, label in zip(team_1_ids[rows].tolist(), team_2_ids[rows].tolist(),
+                                                     features[rows], labels[rows].tolist())])
+            win_ps[positions] = np.asarray(classes_probabilities)[:, 1]
+        return win_ps.tolist()
+
+
+class PredictionServer:
+    """
+    Minimal HTTP/1.1 server on top of asyncio streams (no dependencies), with keep-alive connections:
+    - GET /predict?year=2022&team_1=1101&team_2=1234: {"win_p": ...}, probability that team_1 beats team_2;
+    - POST /predict with {"queries": [{"year": ..., "team_1": ..., "team_2": ...}, ...]}: {"win_p": [...]};
+    - GET /metrics: latency and throughput metrics;
+    - GET /health.
+    """
+
+    def __init__(self, service: PredictionService, host: str = "127.0.0.1", port: int = 8080):
+        self.service: PredictionService = service
+        self.host: str = host
+        self.port: int = port
+        self.logger = logging.getLogger(__name__)
+
+    async def serve(self):
+        batcher = asyncio.ensure_future(self.service.run_batcher())
+        server = await asyncio.start_server(self._handle_connection, self.host, self.port)
+        self.logger.info(f'Serving predictions on http://{self.host}:{self.port}.')
+        try:
+            async with server:
+                await server.serve_forever()
+        finally:
+            batcher.cancel()
+
+    async def _handle_connection(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                request_line = await reader.readline()
+                if not request_line:
+                    break
+                method, target, version = request_line.decode("latin-1").split()
+
+                headers = {}
+                while True:
+                    line = (await reader.readline()).decode("latin-1").strip()
+                    if not line:
+                        break
+                    name, _, value = line.partition(":")
+                    headers[name.strip().lower()] = value.strip()
+
+                body = await reader.readexactly(int(headers.get("content-length", 0)))
+                status, payload = await self._dispatch(method, target, body)
+
+                keep_alive = version == "HTTP/1.1" and headers.get("connection", "").lower() != "close"
+                content = json.dumps(payload).encode()
+                writer.write(f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}\r\n"
+                             f"Content-Type: application/json\r\nContent-Length: {len(content)}\r\n"
+                             f"Connection: {'keep-alive' if keep_alive else 'close'}\r\n\r\n".encode() + content)
+                await writer.drain()
+                if not keep_alive:
+                    break
+        except (ConnectionError, ValueError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    async def _dispatch(self, method: str, target: str, body: bytes) -> Tuple[int, Dict]:
+        start = time.perf_counter()
+        url = urlsplit(target)
+        try:
+            if url.path == "/health":
+                return 200, {"status": "ok"}
+            if url.path == "/metrics":
+                return 200, self.service.metrics.to_dict()
+            if url.path != "/predict":
+                raise ServiceError(404, f"Unknown route {url.path}.")
+
+            if method == "GET":
+                query = parse_qs(url.query)
+                queries = [self._parse_query({key: values[0] for key, values in query.items()})]
+            elif method == "POST":
+                content = json.loads(body or b"{}")
+                queries = content.get("queries", []) if isinstance(content, dict) else None
+                if not isinstance(queries, list) or not all(isinstance(query, dict) for query in queries):
+                    raise ServiceError(400, 'Expected a JSON object with a "queries" list of objects.')
+                queries = [self._parse_query(query) for query in queries]
+            else:
+                raise ServiceError(400, f"Unsupported method {method}.")
+
+            win_ps = await self.service.predict(queries)
+            self.service.metrics.record_request(time.perf_counter() - start, len(queries))
+            return 200, {"win_p": win_ps[0] if method == "GET" else win_ps}
+        except ServiceError as error:
+            self.service.metrics.errors += 1
+            return error.status, {"error": str(error)}
+        except (KeyError, ValueError, TypeError, AttributeError) as error:
+            self.service.metrics.errors += 1
+            return 400, {"error": f"Malformed query: {error}"}
+
+    @staticmethod
+    def _parse_query(query: Dict) -> Tuple[int, int, int]:
+        return int(query["year"]), int(query["team_1"]), int(query["team_2"])
@@ -1,13 +1,13 @@
+import hashlib
+from copy import deepcopy
 from statistics import mean
 from typing import Dict
 
-from sklearn.ensemble import GradientBoostingClassifier
-from sklearn.linear_model import LogisticRegression
-from sklearn.neural_network import MLPClassifier
-from sklearn.preprocessing import MinMaxScaler
+import numpy as np
 
 from classifier import Classifier, FiftyFiftyClassifier, NeuralNetworkClassifier, SeedsBasedClassifier, TreeClassifier, \
-    LogisticRegressionClassifier
+    LogisticRegressionClassifier, ScaledEstimatorClassifier, TeamValuesClassifier
+from profiler import profiler
 from season import Season
 
 
@@ -29,6 +29,53 @@ class Span:
         self.seasons: [Season] = seasons
         self.classifier_type: str = classifier_type
 
+        # Design matrix and labels of the last training, kept to describe (and hash) the training data.
+        self.features: [[float]] = []
+        self.labels: [int] = []
+
+    @property
+    def years(self) -> [int]:
+        return [season.year for season in self.seasons]
+
+    @property
+    def feature_layout(self) -> [str]:
+        return self.seasons[0].feature_layout if self.seasons else []
+
+    """
+    Selects the features, by name, of every season in the span. See Season.set_features.
+    """
+
+    def set_features(self, absolute_features: [str], relative_features: [str]):
+        for season in self.seasons:
+            season.set_features(absolute_features, relative_features)
+
+    """
+    Returns a SHA-256 digest of the training data (features and labels), which identifies what a classifier was
+    fitted on. Builds the features if the span wasn't trained yet.
+    """
+
+    def get_data_hash(self) -> str:
+        features, labels = self.features, self.labels
+        if not labels:
+            features, labels = self.get_features_and_labels()
+
+        digest = hashlib.sha256()
+        digest.update(np.asarray(features, dtype=np.float64).tobytes())
+        digest.update(np.asarray(labels, dtype=np.int64).tobytes())
+        return digest.hexdigest()
+
+    """
+    Concatenates each season's features and labels.
+    """
+
+    def get_features_and_labels(self):
+        span_features, span_labels = [], []
+        for season in self.seasons:
+            season_features, season_labels = season.get_season_features_and_labels()
+            span_features.extend(season_features)
+            span_labels.extend(season_labels)
+        return span_features, span_labels
+
     """
     The train API lets users fit a Multi-Layer Perceptron classifier (using a logarithmic
     loss function) based on the outcomes of tournament games of each season in the span. 
@@ -43,14 +90,23 @@ class Span:
     can fit a classifier and return it for prediction purposes.
     """
 
+    @profiler.profiled("span.train")
     def train(self, max_iter: int = 1000) -> Classifier:
-        span_features, span_labels = [], []
+        span_features, span_labels = self.get_features_and_labels()
+        self.features, self.labels = span_features, span_labels
 
-        # Concatenate each season's features and labels.
-        for season in self.seasons:
-            season_features, season_labels = season.get_season_features_and_labels()
-            span_features.extend(season_features)
-            span_labels.extend(season_labels)
+        profiler.count(len(span_labels))
+        return Span.fit_classifier(self.classifier_type, span_features, span_labels, max_iter)
+
+    """
+    Fits a classifier of the given type on a design matrix and its labels. Doesn't depend on the span's seasons,
+    so it can run in worker processes (see ensemble.StackingEnsemble) with only the matrices sent over.
+    """
+
+    @staticmethod
+    def fit_classifier(classifier_type: str, span_features, span_labels, max_iter: int = 1000) -> Classifier:
+        # sklearn is slow to import: only import it when actually training, and only the estimator we need.
+        from sklearn.preprocessing import MinMaxScaler
 
         scaler = MinMaxScaler()
 
@@ -63,24 +119,101 @@ class Span:
         # Two layers for now.
         hidden_layer_sizes = (layer_size, layer_size)
 
-        if self.classifier_type == "MLP":
+        if classifier_type == "MLP":
+            from sklearn.neural_network import MLPClassifier
             mlp_classifier = MLPClassifier(hidden_layer_sizes=hidden_layer_sizes, max_iter=max_iter)
             mlp_classifier.fit(scaled, span_labels)
 
             return NeuralNetworkClassifier(mlp_classifier, scaler)
-        elif self.classifier_type == "LR":
+        elif classifier_type == "LR":
+            from sklearn.linear_model import LogisticRegression
             lr_classifier = LogisticRegression(C=10)
             lr_classifier.fit(scaled, span_labels)
             return LogisticRegressionClassifier(lr_classifier, scaler)
-        elif self.classifier_type == "GB":
+        elif classifier_type == "GB":
+            from sklearn.ensemble import GradientBoostingClassifier
             gb_classifier = GradientBoostingClassifier(n_estimators=500, learning_rate=0.0001, max_depth=10)
             gb_classifier.fit(scaled, span_labels)
             return TreeClassifier(gb_classifier, scaler)
-        # elif self.classifier_type == "LGBM":
+        # elif classifier_type == "LGBM":
         #     lgbm_classifier = LGBMClassifier(n_estimators=1000, learning_rate=0.01, max_depth=10,
         #                                                random_state=0)
         #     lgbm_classifier.fit(span_features, span_labels)
         #     return TreeClassifier(gb_classifier)
+
+    """
+    Incremental training: adds new seasons to the span and continues fitting a classifier previously trained on
+    this span, instead of refitting from scratch.
+
+    Only the new seasons' features are built: they are appended to the design matrix cached by the last training.
+    The optimization then resumes from the previous model, on the whole design matrix:
+    - MLP: warm start from the current weights, for max_iter more iterations;
+    - LR: warm start of the solver from the current coefficients;
+    - GB: additional_estimators more trees on top of the existing ones.
+
+    The scaler is kept as fitted: the previous model's weights are expressed in its coordinates. New features
+    may fall slightly outside of [0, 1], which the models handle fine.
+
+    The input classifier is left untouched. Use get_refit_drift to measure how far the result is from a full refit.
+    """
+
+    @profiler.profiled("span.train_incremental")
+    def train_incremental(self, classifier: ScaledEstimatorClassifier, new_seasons: [Season], max_iter: int = 200,
+                          additional_estimators: int = 50) -> Classifier:
+        # Reject unsupported classifiers before touching the span.
+        assert isinstance(classifier, (NeuralNetworkClassifier, LogisticRegressionClassifier, TreeClassifier)), \
+            f"Can't train a {type(classifier).__name__} incrementally."
+
+        if not self.labels:
+            self.features, self.labels = self.get_features_and_labels()
+
+        for season in new_seasons:
+            season_features, season_labels = season.get_season_features_and_labels()
+            self.features.extend(season_features)
+            self.labels.extend(season_labels)
+            profiler.count(len(season_labels))
+        # A new list: the seasons list the span was created with belongs to the caller.
+        self.seasons = self.seasons + list(new_seasons)
+
+        scaled = classifier.scaler.transform(self.features)
+        estimator = deepcopy(classifier.estimator)
+
+        if isinstance(classifier, NeuralNetworkClassifier):
+            estimator.set_params(warm_start=True, max_iter=max_iter)
+            estimator.fit(scaled, self.labels)
+            return NeuralNetworkClassifier(estimator, classifier.scaler)
+        elif isinstance(classifier, LogisticRegressionClassifier):
+            estimator.set_params(warm_start=True)
+            estimator.fit(scaled, self.labels)
+            return LogisticRegressionClassifier(estimator, classifier.scaler)
+        elif isinstance(classifier, TreeClassifier):
+            estimator.set_params(warm_start=True, n_estimators=estimator.n_estimators + additional_estimators)
+            estimator.fit(scaled, self.labels)
+            return TreeClassifier(estimator, classifier.scaler)
+
+    """
+    Compares a classifier (usually trained incrementally) with a full refit on this span's training data. Returns
+    the mean and max absolute differences of their win probabilities over the training match-ups, and both log
+    losses.
+
+    This retrains from scratch, so it costs a full fit: use it to validate the incremental mode, not routinely.
+    """
+
+    def get_refit_drift(self, classifier: ScaledEstimatorClassifier, max_iter: int = 1000) -> Dict[str, float]:
+        from sklearn.metrics import log_loss
+
+        refit_classifier = self.train(max_iter)
+        win_p = np.asarray(classifier.predict_proba_features(self.features))[:, 1]
+        refit_win_p = np.asarray(refit_classifier.predict_proba_features(self.features))[:, 1]
+        differences = np.abs(win_p - refit_win_p)
+
+        return {
+            "mean_abs_diff": float(differences.mean()),
+            "max_abs_diff": float(differences.max()),
+            "log_loss": float(log_loss(self.labels, win_p)),
+            "refit_log_loss": float(log_loss(self.labels, refit_win_p)),
+        }
+
     """
     The predict API relies on a dictionary of classifiers indexed by the season's year (a classifier per season)
     to give predictions. If a specific season doesn't have an entry in that dictionary, we use the 50/50 classifier. 
@@ -90,6 +223,7 @@ class Span:
     your training seasons.
     """
 
+    @profiler.profiled("span.predict")
     def predict(self, classifiers: Dict = {}) -> Dict:
         # Map of season's year to predictions.
         span_predictions: Dict = {}
@@ -113,6 +247,44 @@ class Span:
 
         return seasons_seeds_based_classifiers
 
+    """
+    Fits the parameter of a heuristic classifier (see Season.get_heuristic_classifier) on this span's tournament
+    games, by minimizing the log loss. Each game is seen from both points of view, like in training.
+
+    No features are built: the value differences of all games are gathered in a single array, and the log loss of
+    every candidate parameter is computed at once.
+    """
+
+    @profiler.profiled("span.fit_heuristic")
+    def fit_heuristic(self, heuristic: str, rating: str = "gap_average") -> float:
+        differences, labels = [], []
+        classifier_class = None
+        for season in self.seasons:
+            classifier = season.get_heuristic_classifier(heuristic, rating=rating)
+            classifier_class = type(classifier)
+            w_team_ids, l_team_ids = season.get_tournament_games_ids()
+            differences.extend([classifier.get_differences(w_team_ids, l_team_ids),
+                                classifier.get_differences(l_team_ids, w_team_ids)])
+            labels.extend([np.ones(len(w_team_ids)), np.zeros(len(w_team_ids))])
+
+        assert classifier_class is not None, "Can't fit a heuristic on an empty span."
+        differences = np.concatenate(differences)
+        profiler.count(len(differences))
+        return classifier_class.fit_parameter(differences, np.concatenate(labels))
+
+    """
+    Returns each season's heuristic classifier, all with the same parameter (e.g. fitted on a training span).
+    """
+
+    def get_seasons_heuristic_classifiers(self, heuristic: str, parameter: float = None,
+                                          rating: str = "gap_average") -> Dict[int, TeamValuesClassifier]:
+        seasons_heuristic_classifiers: Dict[int, TeamValuesClassifier] = {}
+
+        for season in self.seasons:
+            seasons_heuristic_classifiers[season.year] = season.get_heuristic_classifier(heuristic, parameter, rating)
+
+        return seasons_heuristic_classifiers
+
     """
     Returns a dictionary mapping each season to the same classifier, the one provided as input.
     """
@@ -133,6 +305,7 @@ class Span:
     """
 
     @staticmethod
+    @profiler.profiled("span.score")
     def score(span_predictions: Dict) -> Dict[int, float]:
         scores: Dict[int, float] = {}
 
@@ -142,6 +315,7 @@ class Span:
                 if prediction.label != -1:
                     relevant_predictions.append(prediction)
 
+            profiler.count(len(relevant_predictions))
             relevant_predictions_scores = [prediction.score for prediction in relevant_predictions]
             scores[year] = mean(relevant_predictions_scores)
 
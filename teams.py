@@ -1,3 +1,8 @@
+from collections.abc import Mapping
+from typing import Dict, Iterator
+
+import numpy as np
+
 from feature import Feature, AbsoluteFeature
 
 
@@ -12,6 +17,99 @@ class Team:
         self.last_d1_season: int = last_d1_season
 
 
+class TeamRegistry(Mapping):
+    """
+    Immutable registry of all division 1 teams, shared by every season.
+
+    The registry maps Kaggle team IDs (1101, 1102, ...) to dense indices 0..n-1, in ascending team ID order.
+    Per-team statistics are stored in arrays of length n indexed by those dense indices, which turns per-team
+    lookups into array indexing.
+
+    Team names and division 1 season ranges are held in arrays too. For the women's data, which has no division 1
+    season columns, both ranges are 0.
+
+    The registry behaves like a read-only dictionary of team ID to Team.
+    """
+
+    def __init__(self, teams: [Team]):
+        teams = sorted(teams, key=lambda team: team.id)
+
+        self._teams: [Team] = teams
+        self._indices: Dict[int, int] = {team.id: idx for idx, team in enumerate(teams)}
+        assert len(self._indices) == len(teams), "Duplicate team IDs in registry."
+
+        self.ids: np.ndarray = self._freeze(np.array([team.id for team in teams], dtype=np.int64))
+        self.names: np.ndarray = self._freeze(np.array([team.name for team in teams], dtype=object))
+        self.first_d1_seasons: np.ndarray = self._freeze(
+            np.array([team.first_d1_season for team in teams], dtype=np.int64))
+        self.last_d1_seasons: np.ndarray = self._freeze(
+            np.array([team.last_d1_season for team in teams], dtype=np.int64))
+        self._frozen: bool = True
+
+    @staticmethod
+    def _freeze(array: np.ndarray) -> np.ndarray:
+        array.flags.writeable = False
+        return array
+
+    # Attributes can only be set while __init__ runs: once frozen, neither reassigned, added nor deleted.
+    def __setattr__(self, name, value):
+        if self.__dict__.get("_frozen", False):
+            raise AttributeError(f"TeamRegistry is immutable, cannot set {name}.")
+        super().__setattr__(name, value)
+
+    def __delattr__(self, name):
+        raise AttributeError(f"TeamRegistry is immutable, cannot delete {name}.")
+
+    def __getitem__(self, team_id: int) -> Team:
+        return self._teams[self._indices[team_id]]
+
+    def __iter__(self) -> Iterator[int]:
+        return iter(self._indices)
+
+    def __len__(self) -> int:
+        return len(self._teams)
+
+    """
+    Returns the dense index of a team ID. Raises a KeyError for unknown team IDs.
+    """
+
+    def index(self, team_id: int) -> int:
+        return self._indices[team_id]
+
+    """
+    Returns the dense indices of an array of team IDs, in one vectorized pass (team IDs are sorted, so we can
+    binary search them instead of hashing each one).
+    """
+
+    def indices(self, team_ids) -> np.ndarray:
+        team_ids = np.asarray(team_ids, dtype=np.int64)
+        positions = np.searchsorted(self.ids, team_ids)
+        positions = np.minimum(positions, len(self.ids) - 1)
+        unknown = self.ids[positions] != team_ids
+        if unknown.any():
+            raise KeyError(f"Unknown team IDs: {team_ids[unknown].tolist()}")
+        return positions
+
+    """
+    Returns a boolean mask over the registry, True for each of the provided team IDs.
+    """
+
+    def mask(self, team_ids) -> np.ndarray:
+        mask = np.zeros(len(self), dtype=bool)
+        mask[self.indices(team_ids)] = True
+        return mask
+
+    """
+    Returns a boolean mask over the registry, True for the teams in division 1 during a season. None when the
+    division 1 season ranges are unknown (women's data).
+    """
+
+    def d1_mask(self, year: int) -> np.ndarray:
+        if not self.last_d1_seasons.any():
+            return None
+        return (self.first_d1_seasons <= year) & (year <= self.last_d1_seasons)
+
+
 class MatchUp:
     """
     Represents a potential match-up of team_1 vs. team_2. No enforced rule on the teams IDs..
@@ -21,4 +119,4 @@ class MatchUp:
         self.team_2_id: int = team_2_id
 
     def get_teams_ids_feature(self) -> Feature:
-        return AbsoluteFeature(self.team_1_id, self.team_2_id)
\ No newline at end of file
+        return AbsoluteFeature(self.team_1_id, self.team_2_id)
@@ -1,5 +1,8 @@
 from typing import Dict
 
+import numpy as np
+
+from bracket import BRACKET_ORDER, REGIONS, LiveBracket
 from feature import AbsoluteFeature, Feature, RelativeFeature
 from game import Game
 from seed import Seed
@@ -106,3 +109,19 @@ class Tournament:
 
     def get_expected_outcome(self, team_1_id, team_2_id):
         return self.expected_outcomes.get(f"{team_1_id}_{team_2_id}", -1)
+
+    """
+    Starts the live mode: returns a LiveBracket of this tournament, to condition advancement probabilities on
+    results as they arrive. win_p[i, j] is the probability that team i beats team j, with rows and columns in
+    team_ids order.
+    """
+
+    def get_live_bracket(self, win_p: np.ndarray) -> LiveBracket:
+        leaves = []
+        for region in REGIONS:
+            for position in BRACKET_ORDER:
+                leaf_team_ids = sorted(team_id for team_id, seed in self.seeds.items()
+                                       if seed.region == region and seed.position == position)
+                assert leaf_team_ids, f"No {region}{position:02d} seed in {self.year}."
+                leaves.append(leaf_team_ids)
+        return LiveBracket(self.team_ids, leaves, win_p)